@@ -1,46 +1,100 @@
 
 
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
-from PIL import Image
 import torch
-from torchvision import transforms
-from transformers import AutoModelForImageClassification
 import pandas as pd
+import label_index
+import inference
+from inference import transform
 
-# Load your model
-@st.cache_data
+# AI-HUB root, for the shared utils package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from utils import image_utils
+
+# Load the ground-truth labels (indexed by 'Image Index', rebuilt only when the CSV changes)
+@st.cache_resource
 def load_dataset():
     dataset_path = "./Data_Entry_2017_v2020.csv"  # Replace with your dataset path 
-    return pd.read_csv(dataset_path)
+    return label_index.load_label_index(dataset_path)
 
 data = load_dataset()
 
+# Load your model (fp32 torch by default; CHESTXRAY_BACKEND selects torch-int8, onnx or onnx-int8)
 @st.cache_resource
 def load_model():
-    # Define the model architecture
-    model = AutoModelForImageClassification.from_pretrained("google/vit-base-patch16-224-in21k", num_labels=15)
-    # Load the saved state dictionary
-    state_dict = torch.load("best_model_new_retrain.pth", map_location=torch.device('cpu'))
-    model.load_state_dict(state_dict)
-    model.eval()
-    return model
+    return inference.load_backend()
 
 model = load_model()
 
-# Define image transformation
-transform = transforms.Compose([
-    transforms.Resize((224, 224)),  # Adjust based on your model's requirements
-    transforms.ToTensor(),
-    transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])  # ImageNet stats
-])
-
 # Function to make predictions
 def predict_image(image):
-    image = transform(image).unsqueeze(0)  # Add batch dimension
-    with torch.no_grad():
-        outputs = model(image).logits
-        probabilities = torch.sigmoid(outputs)
-    return probabilities
+    return predict_images([transform(image)])[0].unsqueeze(0)
+
+# Score preprocessed image tensors in batches of batch_size, one ViT forward pass per batch
+def predict_images(image_tensors, batch_size=32):
+    probabilities = []
+    for start in range(0, len(image_tensors), batch_size):
+        batch = torch.stack(image_tensors[start:start + batch_size])
+        probabilities.append(model.predict(batch))
+    return torch.cat(probabilities) if probabilities else torch.empty(0, inference.NUM_LABELS)
+
+# Decode and transform an uploaded file's bytes (runs on the decode thread pool)
+def prepare_image(image_bytes):
+    return transform(image_utils.load_image(image_bytes, image_utils.VIT_IMAGE_SIZE))
+
+# Probabilities keyed by file content hash, shared across reruns (and sessions) so re-clicks don't re-score
+# images; least recently used entries are evicted past PREDICTION_CACHE_SIZE so a long-running app stays bounded
+PREDICTION_CACHE_SIZE = 10000
+
+class PredictionCache:
+    def __init__(self, cache_size=PREDICTION_CACHE_SIZE):
+        self.cache_size = cache_size
+        self.predictions = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, file_hash):
+        with self.lock:
+            if file_hash not in self.predictions:
+                return None
+            self.predictions.move_to_end(file_hash)
+            return self.predictions[file_hash]
+
+    def put(self, file_hash, probabilities):
+        with self.lock:
+            self.predictions[file_hash] = probabilities
+            self.predictions.move_to_end(file_hash)
+            while len(self.predictions) > self.cache_size:
+                self.predictions.popitem(last=False)
+
+@st.cache_resource
+def get_prediction_cache():
+    return PredictionCache()
+
+def get_predictions(files_bytes, batch_size):
+    prediction_cache = get_prediction_cache()
+    file_hashes = [hashlib.sha256(image_bytes).hexdigest() for image_bytes in files_bytes]
+    # Hits are taken before scoring the misses, so evictions during this call can't drop them
+    predictions, missing = {}, {}
+    for file_hash, image_bytes in zip(file_hashes, files_bytes):
+        cached = prediction_cache.get(file_hash)
+        if cached is not None:
+            predictions[file_hash] = cached
+        else:
+            missing[file_hash] = image_bytes
+    if missing:
+        with ThreadPoolExecutor() as executor:
+            image_tensors = list(executor.map(prepare_image, missing.values()))
+        probabilities = predict_images(image_tensors, batch_size)
+        for file_hash, file_probabilities in zip(missing, probabilities):
+            predictions[file_hash] = file_probabilities.tolist()
+            prediction_cache.put(file_hash, predictions[file_hash])
+    return [predictions[file_hash] for file_hash in file_hashes]
 
 # Streamlit App
 st.title("Chest Xray Disease Prediction App")
@@ -49,32 +103,25 @@ st.write("Upload single or multiple images to get predictions.")
 # File uploader for single or bulk images
 uploaded_files = st.file_uploader("Upload Image(s)", type=["jpg", "png", "jpeg"], accept_multiple_files=True)
 
+batch_size = st.sidebar.number_input("Inference batch size", min_value=1, max_value=256, value=32)
+
 # Process each uploaded file
 if uploaded_files:
-    for uploaded_file in uploaded_files:
-        # Load and display the image
-        image = Image.open(uploaded_file).convert("RGB")
-        st.image(image, caption=f"Uploaded Image: {uploaded_file.name}", use_column_width=True)
-        
-        # Search for the filename in the dataset
-        uploaded_filename = uploaded_file.name
-        matching_row = data[data['Image Index'] == uploaded_filename]
-        truth = matching_row.iloc[0]['Finding Labels'] if not matching_row.empty else "No matching label found"
+    files_bytes = [uploaded_file.getvalue() for uploaded_file in uploaded_files]
+    all_probabilities = get_predictions(files_bytes, int(batch_size))
+    # Search for every filename in the dataset at once
+    truths = label_index.lookup_labels(data, [uploaded_file.name for uploaded_file in uploaded_files])
+    for uploaded_file, image_bytes, probabilities, truth in zip(uploaded_files, files_bytes, all_probabilities, truths):
+        # Display the image
+        st.image(image_bytes, caption=f"Uploaded Image: {uploaded_file.name}", use_column_width=True)
         
         st.write(f"**Truth (Ground Truth Labels):** {truth}")
 
-        # Get predictions
-        probabilities = predict_image(image)
-
         # Create a DataFrame to display probabilities
-        label_columns = [
-            'No Finding', 'Infiltration', 'Effusion', 'Atelectasis', 'Nodule',
-            'Mass', 'Pneumothorax', 'Consolidation', 'Pleural_Thickening',
-            'Cardiomegaly', 'Emphysema', 'Edema', 'Fibrosis', 'Pneumonia', 'Hernia'
-        ]
+        label_columns = inference.LABEL_COLUMNS
         prediction_df = pd.DataFrame({
             "Class": label_columns,
-            "Probability": probabilities.squeeze().tolist()
+            "Probability": probabilities
         })
 
         # Highlight the highest probabilities (you can customize the threshold)
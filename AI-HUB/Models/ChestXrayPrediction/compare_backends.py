@@ -0,0 +1,92 @@
+import argparse
+import glob
+import os
+import sys
+import time
+
+import pandas as pd
+import torch
+
+import inference
+
+# AI-HUB root, for the shared utils package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from utils import image_utils
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare the ChestXray inference backends against the fp32 PyTorch model.")
+    parser.add_argument("images", help="Directory of held-out X-ray images")
+    parser.add_argument("--backends", default="torch-int8,onnx,onnx-int8", help="Comma separated backends to compare with fp32 torch")
+    parser.add_argument("--checkpoint", default=inference.CHECKPOINT_PATH)
+    parser.add_argument("--limit", type=int, default=256, help="Maximum number of held-out images")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=None, help="CPU threads per backend (default: torch's default)")
+    parser.add_argument("--output", help="Optional CSV for the per-label drift table")
+    return parser.parse_args()
+
+
+def load_held_out_set(image_dir, limit):
+    paths = sorted(path for path in glob.glob(os.path.join(image_dir, "**", "*"), recursive=True)
+                   if path.lower().endswith(IMAGE_EXTENSIONS))[:limit]
+    if not paths:
+        raise SystemExit(f"No images found in {image_dir}")
+    images = image_utils.load_images(paths, image_utils.VIT_IMAGE_SIZE)
+    return torch.stack([inference.transform(image) for image in images])
+
+
+def run_backend(backend, images, batch_size):
+    # One warm-up batch, then timed batches over the whole held-out set
+    backend.predict(images[:batch_size])
+    probabilities = []
+    start = time.perf_counter()
+    for index in range(0, len(images), batch_size):
+        probabilities.append(backend.predict(images[index:index + batch_size]))
+    elapsed = time.perf_counter() - start
+    return torch.cat(probabilities), elapsed
+
+
+def main():
+    args = parse_args()
+    images = load_held_out_set(args.images, args.limit)
+    threads = args.threads or torch.get_num_threads()
+    print(f"{len(images)} held-out images, batch size {args.batch_size}, {threads} thread(s)")
+
+    reference_model = inference.load_torch_model(args.checkpoint)
+    reference_probabilities, reference_elapsed = run_backend(inference.TorchBackend(reference_model), images, args.batch_size)
+    timings = [("torch", reference_elapsed)]
+    drift_rows = []
+    for backend_name in [name.strip() for name in args.backends.split(",") if name.strip()]:
+        if backend_name == "torch-int8":
+            backend = inference.TorchBackend(inference.quantize_torch_model(inference.load_torch_model(args.checkpoint)))
+        else:
+            backend = inference.load_backend(backend_name, args.checkpoint, args.threads)
+        probabilities, elapsed = run_backend(backend, images, args.batch_size)
+        timings.append((backend_name, elapsed))
+        drift = (probabilities - reference_probabilities).abs()
+        flips = ((probabilities > 0.5) != (reference_probabilities > 0.5)).float()
+        for label_index, label in enumerate(inference.LABEL_COLUMNS):
+            drift_rows.append({
+                "Backend": backend_name,
+                "Label": label,
+                "Max Abs Drift": drift[:, label_index].max().item(),
+                "Mean Abs Drift": drift[:, label_index].mean().item(),
+                "Decision Flips @0.5": int(flips[:, label_index].sum().item()),
+            })
+
+    drift_df = pd.DataFrame(drift_rows)
+    print("\nPer-label probability drift vs fp32 torch:")
+    print(drift_df.to_string(index=False, float_format="{:.5f}".format))
+    print("\nLatency / throughput:")
+    for backend_name, elapsed in timings:
+        images_per_second = len(images) / elapsed
+        print(f"  {backend_name:<11} {elapsed / len(images) * 1000:8.2f} ms/image  {images_per_second:8.1f} images/s  "
+              f"{images_per_second / threads:7.1f} images/s/core  x{reference_elapsed / elapsed:.2f} vs fp32")
+    if args.output:
+        drift_df.to_csv(args.output, index=False)
+
+
+if __name__ == "__main__":
+    main()
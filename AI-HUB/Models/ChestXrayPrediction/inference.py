@@ -0,0 +1,162 @@
+import json
+import os
+import torch
+from safetensors import safe_open
+from safetensors.torch import load_file, save_file
+from torchvision import transforms
+from transformers import AutoConfig, AutoModelForImageClassification
+
+BASE_MODEL = "google/vit-base-patch16-224-in21k"
+CHECKPOINT_PATH = "best_model_new_retrain.pth"
+NUM_LABELS = 15
+LABEL_COLUMNS = [
+    'No Finding', 'Infiltration', 'Effusion', 'Atelectasis', 'Nodule',
+    'Mass', 'Pneumothorax', 'Consolidation', 'Pleural_Thickening',
+    'Cardiomegaly', 'Emphysema', 'Edema', 'Fibrosis', 'Pneumonia', 'Hernia'
+]
+
+# Backend is picked once at startup, e.g. CHESTXRAY_BACKEND=onnx-int8 streamlit run app.py
+BACKENDS = ["torch", "torch-int8", "onnx", "onnx-int8"]
+BACKEND_ENV_VAR = "CHESTXRAY_BACKEND"
+
+# Define image transformation
+transform = transforms.Compose([
+    transforms.Resize((224, 224)),  # Adjust based on your model's requirements
+    transforms.ToTensor(),
+    transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])  # ImageNet stats
+])
+
+
+def get_artifact_path(checkpoint_path):
+    base_path, _ = os.path.splitext(checkpoint_path)
+    return base_path + ".safetensors"
+
+
+# One self-contained file: the fine-tuned weights plus the model config in the safetensors metadata
+def export_artifact(checkpoint_path, artifact_path):
+    config = AutoConfig.from_pretrained(BASE_MODEL, num_labels=NUM_LABELS)
+    state_dict = torch.load(checkpoint_path, map_location=torch.device('cpu'), weights_only=True)
+    state_dict = {name: tensor.contiguous() for name, tensor in state_dict.items()}
+    temp_path = artifact_path + ".tmp"
+    save_file(state_dict, temp_path, metadata={"config": config.to_json_string()})
+    os.replace(temp_path, artifact_path)
+    return artifact_path
+
+
+# The artifact is written next to the .pth checkpoint the first time it is needed
+def ensure_artifact(checkpoint_path=CHECKPOINT_PATH):
+    if checkpoint_path.endswith(".safetensors"):
+        return checkpoint_path
+    artifact_path = get_artifact_path(checkpoint_path)
+    if not os.path.exists(artifact_path):
+        export_artifact(checkpoint_path, artifact_path)
+    return artifact_path
+
+
+def load_artifact_model(artifact_path):
+    with safe_open(artifact_path, framework="pt") as artifact:
+        config = AutoConfig.for_model(**json.loads(artifact.metadata()["config"]))
+    # Build the architecture on the meta device (no weight allocation or random init), then
+    # adopt the memory-mapped tensors as-is, so weights are read once, lazily, through the page cache
+    with torch.device("meta"):
+        model = AutoModelForImageClassification.from_config(config)
+    model.load_state_dict(load_file(artifact_path), assign=True)
+    model.eval()
+    return model
+
+
+def load_torch_model(checkpoint_path=CHECKPOINT_PATH):
+    return load_artifact_model(ensure_artifact(checkpoint_path))
+
+
+class TorchBackend:
+    def __init__(self, model):
+        self.model = model
+
+    # Sigmoid probabilities for a (batch, 3, 224, 224) tensor
+    def predict(self, batch):
+        with torch.inference_mode():
+            return torch.sigmoid(self.model(batch).logits)
+
+
+class OnnxBackend:
+    def __init__(self, onnx_path, num_threads=None):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = onnxruntime.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+
+    def predict(self, batch):
+        logits = self.session.run(["logits"], {"pixel_values": batch.numpy()})[0]
+        return torch.sigmoid(torch.from_numpy(logits))
+
+
+# Only the logits, so the exported graph has a single plain tensor output
+class LogitsOnly(torch.nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, pixel_values):
+        return self.model(pixel_values=pixel_values).logits
+
+
+def quantize_torch_model(model):
+    # Dynamic int8: Linear weights are stored as int8 and activations quantized on the fly,
+    # which covers nearly all of the ViT's compute on CPU
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def get_onnx_path(checkpoint_path, quantized=False):
+    base_path, _ = os.path.splitext(checkpoint_path)
+    return base_path + (".int8.onnx" if quantized else ".onnx")
+
+
+def export_onnx(model, onnx_path):
+    dummy_input = torch.randn(1, 3, 224, 224)
+    torch.onnx.export(
+        LogitsOnly(model).eval(),
+        (dummy_input,),
+        onnx_path,
+        input_names=["pixel_values"],
+        output_names=["logits"],
+        dynamic_axes={"pixel_values": {0: "batch"}, "logits": {0: "batch"}},
+        opset_version=17,
+        dynamo=False,  # the TorchScript exporter keeps the dynamic batch axis and a single self-contained file
+    )
+    return onnx_path
+
+
+def quantize_onnx(onnx_path, quantized_path):
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(onnx_path, quantized_path, weight_type=QuantType.QInt8)
+    return quantized_path
+
+
+# Exported/quantized ONNX graphs are written next to the checkpoint the first time they are needed
+def ensure_onnx_model(checkpoint_path=CHECKPOINT_PATH, quantized=False, model=None):
+    onnx_path = get_onnx_path(checkpoint_path)
+    if not os.path.exists(onnx_path):
+        export_onnx(model if model is not None else load_torch_model(checkpoint_path), onnx_path)
+    if not quantized:
+        return onnx_path
+    quantized_path = get_onnx_path(checkpoint_path, quantized=True)
+    if not os.path.exists(quantized_path):
+        quantize_onnx(onnx_path, quantized_path)
+    return quantized_path
+
+
+def load_backend(backend=None, checkpoint_path=CHECKPOINT_PATH, num_threads=None):
+    backend = backend or os.environ.get(BACKEND_ENV_VAR, "torch")
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}")
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    if backend == "torch":
+        return TorchBackend(load_torch_model(checkpoint_path))
+    if backend == "torch-int8":
+        return TorchBackend(quantize_torch_model(load_torch_model(checkpoint_path)))
+    return OnnxBackend(ensure_onnx_model(checkpoint_path, quantized=backend == "onnx-int8"), num_threads)
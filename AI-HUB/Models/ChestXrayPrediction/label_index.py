@@ -0,0 +1,57 @@
+import os
+import pandas as pd
+
+DATASET_PATH = "./Data_Entry_2017_v2020.csv"
+NO_MATCH = "No matching label found"
+
+# Only the columns the app needs are parsed from the ~112k row CSV
+LABEL_COLUMNS = ["Image Index", "Finding Labels"]
+
+
+def get_csv_fingerprint(csv_path):
+    stat = os.stat(csv_path)
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+
+def get_index_path(csv_path):
+    # The fingerprint is part of the file name, so an edited CSV can never be served from a stale index
+    base_path, _ = os.path.splitext(csv_path)
+    return f"{base_path}.{get_csv_fingerprint(csv_path)}.labels.parquet"
+
+
+def build_label_index(csv_path):
+    labels = pd.read_csv(
+        csv_path,
+        usecols=LABEL_COLUMNS,
+        dtype={"Image Index": "string", "Finding Labels": "category"},
+    )
+    labels = labels.drop_duplicates(subset="Image Index", keep="first")
+    return labels.set_index("Image Index")["Finding Labels"]
+
+
+def remove_stale_indexes(csv_path, current_index_path):
+    directory = os.path.dirname(os.path.abspath(csv_path))
+    prefix = os.path.splitext(os.path.basename(csv_path))[0] + "."
+    for file_name in os.listdir(directory):
+        file_path = os.path.join(directory, file_name)
+        if file_name.startswith(prefix) and file_name.endswith(".labels.parquet") and file_path != os.path.abspath(current_index_path):
+            os.remove(file_path)
+
+
+# Ground-truth labels as a Series indexed by 'Image Index', cached on disk as Parquet
+def load_label_index(csv_path=DATASET_PATH):
+    index_path = get_index_path(csv_path)
+    if os.path.exists(index_path):
+        return pd.read_parquet(index_path)["Finding Labels"]
+    labels = build_label_index(csv_path)
+    temp_path = index_path + ".tmp"
+    labels.to_frame().to_parquet(temp_path)
+    os.replace(temp_path, index_path)
+    remove_stale_indexes(csv_path, index_path)
+    return labels
+
+
+# Ground truth for a batch of filenames in one vectorized join
+def lookup_labels(labels, filenames):
+    matches = labels.reindex(pd.Index(filenames, dtype="string"))
+    return matches.astype("object").where(matches.notna(), NO_MATCH).tolist()
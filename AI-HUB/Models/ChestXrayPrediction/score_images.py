@@ -0,0 +1,205 @@
+import argparse
+import glob
+import os
+import re
+import sys
+import time
+
+import pandas as pd
+import torch
+from torch.utils.data import DataLoader, Dataset
+
+import inference
+import label_index
+
+# AI-HUB root, for the shared utils package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from utils import image_utils
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+PATH_COLUMN = "Image Path"
+PART_FILE_PATTERN = re.compile(r"part-(\d+)\.parquet$")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Score a directory or manifest of chest X-rays without the Streamlit UI.")
+    parser.add_argument("source", help="Image directory (searched recursively) or a manifest text file with one image path per line")
+    parser.add_argument("-o", "--output", default="predictions.csv",
+                        help="Output .csv file, or .parquet directory of chunk files")
+    parser.add_argument("--backend", choices=inference.BACKENDS, default=None,
+                        help=f"Inference backend (default: ${inference.BACKEND_ENV_VAR} or torch)")
+    parser.add_argument("--checkpoint", default=inference.CHECKPOINT_PATH)
+    parser.add_argument("--labels-csv", default=label_index.DATASET_PATH,
+                        help="NIH Data_Entry CSV for the ground-truth join (skipped if missing)")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Image decoding worker processes")
+    parser.add_argument("--threads", type=int, default=None, help="Inference threads (default: torch's default)")
+    parser.add_argument("--chunk-size", type=int, default=1024, help="Rows written per output chunk")
+    parser.add_argument("--no-resume", action="store_true", help="Start over instead of skipping already scored images")
+    return parser.parse_args()
+
+
+def find_images(source):
+    if os.path.isdir(source):
+        return sorted(path for path in glob.glob(os.path.join(source, "**", "*"), recursive=True)
+                      if path.lower().endswith(IMAGE_EXTENSIONS))
+    # Manifest paths are relative to the manifest itself
+    manifest_dir = os.path.dirname(os.path.abspath(source))
+    with open(source, "r", encoding="utf-8") as manifest:
+        return [os.path.join(manifest_dir, line.strip()) for line in manifest if line.strip()]
+
+
+class ImageFileDataset(Dataset):
+    def __init__(self, paths):
+        self.paths = paths
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, index):
+        try:
+            return index, inference.transform(image_utils.load_image(self.paths[index], image_utils.VIT_IMAGE_SIZE)), None
+        except OSError as error:
+            return index, None, str(error)
+
+
+# Unreadable images are dropped from the batch and handed back with their error, so the main process
+# reports them; they are retried on the next (resumed) run
+def collate_images(items):
+    skipped = [(index, error) for index, tensor, error in items if tensor is None]
+    items = [(index, tensor) for index, tensor, _ in items if tensor is not None]
+    if not items:
+        return [], None, skipped
+    indices, tensors = zip(*items)
+    return list(indices), torch.stack(tensors), skipped
+
+
+def init_worker(_):
+    # Decoding workers stay single threaded so they don't compete with the inference threads
+    torch.set_num_threads(1)
+
+
+def is_parquet_output(output_path):
+    return output_path.lower().endswith(".parquet")
+
+
+def truncate_partial_line(csv_path):
+    # An interrupted append can leave half a row at the end of the CSV
+    with open(csv_path, "rb+") as csv_file:
+        content = csv_file.read()
+        if content and not content.endswith(b"\n"):
+            csv_file.truncate(content.rfind(b"\n") + 1)
+
+
+def get_part_index(part_path):
+    match = PART_FILE_PATTERN.search(os.path.basename(part_path))
+    return int(match.group(1)) if match else None
+
+
+def load_scored_paths(output_path):
+    if is_parquet_output(output_path):
+        part_paths = [part_path for part_path in sorted(glob.glob(os.path.join(output_path, "part-*.parquet")))
+                      if get_part_index(part_path) is not None]
+        if not part_paths:
+            return set(), 0
+        scored = pd.concat([pd.read_parquet(part_path, columns=[PATH_COLUMN]) for part_path in part_paths])
+        # Numbering continues after the highest part, even if an earlier one was deleted
+        return set(scored[PATH_COLUMN]), max(get_part_index(part_path) for part_path in part_paths) + 1
+    if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
+        return set(), 0
+    truncate_partial_line(output_path)
+    return set(pd.read_csv(output_path, usecols=[PATH_COLUMN])[PATH_COLUMN]), 0
+
+
+class ChunkWriter:
+    def __init__(self, output_path, next_part, append):
+        self.output_path = output_path
+        self.next_part = next_part
+        self.append = append
+        if is_parquet_output(output_path):
+            os.makedirs(output_path, exist_ok=True)
+
+    def write(self, chunk):
+        if is_parquet_output(self.output_path):
+            # One file per chunk, renamed into place so a crash never leaves a half-written part
+            part_path = os.path.join(self.output_path, f"part-{self.next_part:05d}.parquet")
+            chunk.to_parquet(part_path + ".tmp", index=False)
+            os.replace(part_path + ".tmp", part_path)
+            self.next_part += 1
+            return
+        with open(self.output_path, "a" if self.append else "w", encoding="utf-8", newline="") as csv_file:
+            chunk.to_csv(csv_file, index=False, header=not self.append)
+            csv_file.flush()
+            os.fsync(csv_file.fileno())
+        self.append = True
+
+
+def build_chunk(rows, probabilities, labels):
+    chunk = pd.DataFrame(probabilities, columns=inference.LABEL_COLUMNS)
+    chunk.insert(0, PATH_COLUMN, rows)
+    chunk.insert(1, "Image Index", [os.path.basename(path) for path in rows])
+    if labels is not None:
+        chunk["Finding Labels"] = label_index.lookup_labels(labels, chunk["Image Index"].tolist())
+    return chunk
+
+
+def main():
+    args = parse_args()
+    paths = find_images(args.source)
+    if args.no_resume:
+        scored_paths, next_part = set(), 0
+        if is_parquet_output(args.output):
+            for part_path in glob.glob(os.path.join(args.output, "part-*.parquet")):
+                os.remove(part_path)
+    else:
+        scored_paths, next_part = load_scored_paths(args.output)
+    pending = [path for path in paths if path not in scored_paths]
+    print(f"{len(paths)} image(s), {len(paths) - len(pending)} already scored, {len(pending)} to go")
+    if not pending:
+        return 0
+
+    labels = None
+    if os.path.exists(args.labels_csv):
+        labels = label_index.load_label_index(args.labels_csv)
+    else:
+        print(f"{args.labels_csv} not found, writing predictions without ground truth")
+
+    model = inference.load_backend(args.backend, args.checkpoint, args.threads)
+    loader = DataLoader(
+        ImageFileDataset(pending),
+        batch_size=args.batch_size,
+        num_workers=args.workers,
+        collate_fn=collate_images,
+        worker_init_fn=init_worker,
+        prefetch_factor=4 if args.workers else None,
+        persistent_workers=False,
+    )
+    writer = ChunkWriter(args.output, next_part, append=bool(scored_paths))
+    rows, probabilities = [], []
+    scored = 0
+    skipped = 0
+    start = time.perf_counter()
+    for indices, batch, unreadable in loader:
+        for index, error in unreadable:
+            print(f"Skipping {pending[index]}: {error}")
+        skipped += len(unreadable)
+        if batch is None:
+            continue
+        rows.extend(pending[index] for index in indices)
+        probabilities.append(model.predict(batch))
+        if len(rows) >= args.chunk_size:
+            writer.write(build_chunk(rows, torch.cat(probabilities).numpy(), labels))
+            scored += len(rows)
+            rows, probabilities = [], []
+            elapsed = time.perf_counter() - start
+            print(f"  {scored}/{len(pending)} scored, {scored / elapsed:.1f} images/s")
+    if rows:
+        writer.write(build_chunk(rows, torch.cat(probabilities).numpy(), labels))
+        scored += len(rows)
+    elapsed = time.perf_counter() - start
+    print(f"Scored {scored} image(s) in {elapsed:.1f}s ({scored / elapsed:.1f} images/s), skipped {skipped} unreadable -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,91 @@
+import hashlib
+import os
+import sys
+from collections import OrderedDict
+
+import torch
+from transformers import CLIPModel, CLIPProcessor
+
+# AI-HUB root, for the shared utils package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from utils import image_utils
+
+MODEL_NAME = "quadranttechnologies/retail-content-safety-clip-finetuned"
+DEFAULT_PROMPTS = ["safe", "unsafe"]
+
+
+class ContentSafetyScorer:
+    def __init__(self, model_name=MODEL_NAME, prompts=None, batch_size=32, cache_size=10000, device=None):
+        self.device = torch.device(device or ("cuda" if torch.cuda.is_available() else "cpu"))
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        # Normalized image embeddings keyed by file content hash, least recently used first
+        self.image_embeddings = OrderedDict()
+        self.processor = CLIPProcessor.from_pretrained(model_name)
+        self.image_size = image_utils.get_processor_image_size(self.processor.image_processor)
+        model = CLIPModel.from_pretrained(model_name).to(self.device).eval()
+        self.logit_scale = model.logit_scale.exp().item()
+        self.vision_model = model.vision_model
+        self.visual_projection = model.visual_projection
+        self.text_model = model.text_model
+        self.text_projection = model.text_projection
+        self.set_prompts(prompts or DEFAULT_PROMPTS)
+
+    # The prompts never change between images, so their embeddings are computed once per prompt set
+    def set_prompts(self, prompts):
+        inputs = self.processor(text=list(prompts), return_tensors="pt", padding=True).to(self.device)
+        with torch.inference_mode():
+            pooled = self.text_model(input_ids=inputs["input_ids"], attention_mask=inputs["attention_mask"]).pooler_output
+            text_embeddings = self.text_projection(pooled)
+        self.prompts = list(prompts)
+        self.text_embeddings = torch.nn.functional.normalize(text_embeddings, dim=-1)
+
+    # Vision tower only, one forward pass per batch of decoded images
+    def embed_images(self, images):
+        inputs = self.processor(images=images, return_tensors="pt").to(self.device)
+        with torch.inference_mode():
+            pooled = self.vision_model(pixel_values=inputs["pixel_values"]).pooler_output
+            image_embeddings = self.visual_projection(pooled)
+        return torch.nn.functional.normalize(image_embeddings, dim=-1)
+
+    def cache_embedding(self, image_hash, embedding):
+        self.image_embeddings[image_hash] = embedding
+        self.image_embeddings.move_to_end(image_hash)
+        while len(self.image_embeddings) > self.cache_size:
+            self.image_embeddings.popitem(last=False)
+
+    def get_image_embeddings(self, images_bytes):
+        image_hashes = [hashlib.sha256(image_bytes).hexdigest() for image_bytes in images_bytes]
+        embeddings, missing = {}, {}
+        for image_hash, image_bytes in zip(image_hashes, images_bytes):
+            if image_hash in self.image_embeddings:
+                self.image_embeddings.move_to_end(image_hash)
+                embeddings[image_hash] = self.image_embeddings[image_hash]
+            else:
+                missing[image_hash] = image_bytes
+        missing_hashes = list(missing)
+        for start in range(0, len(missing_hashes), self.batch_size):
+            batch_hashes = missing_hashes[start:start + self.batch_size]
+            images = image_utils.load_images([missing[image_hash] for image_hash in batch_hashes], self.image_size)
+            for image_hash, embedding in zip(batch_hashes, self.embed_images(images)):
+                embeddings[image_hash] = embedding
+                self.cache_embedding(image_hash, embedding)
+        return torch.stack([embeddings[image_hash] for image_hash in image_hashes])
+
+    # Prompt probabilities (images x prompts) for raw image file bytes
+    def score(self, images_bytes):
+        if not images_bytes:
+            return torch.empty(0, len(self.prompts))
+        logits = self.logit_scale * self.get_image_embeddings(images_bytes) @ self.text_embeddings.T
+        return logits.softmax(dim=-1).cpu()
+
+    def classify(self, images_bytes):
+        probabilities = self.score(images_bytes)
+        return [dict(zip(self.prompts, row.tolist())) for row in probabilities]
+
+    def score_files(self, file_paths):
+        images_bytes = []
+        for file_path in file_paths:
+            with open(file_path, "rb") as image_file:
+                images_bytes.append(image_file.read())
+        return self.score(images_bytes)
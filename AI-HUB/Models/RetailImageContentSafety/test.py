@@ -1,19 +1,12 @@
-from PIL import Image
 import requests
 
-from transformers import CLIPProcessor, CLIPModel
+from scorer import ContentSafetyScorer
 
-
-model_name = "quadranttechnologies/retail-content-safety-clip-finetuned"
-model = CLIPModel.from_pretrained(model_name)
-processor = CLIPProcessor.from_pretrained("quadranttechnologies/retail-content-safety-clip-finetuned")
+scorer = ContentSafetyScorer(prompts=["safe", "unsafe"])
 
 url = "http://images.cocodataset.org/val2017/000000039769.jpg"
-image = Image.open(requests.get(url, stream=True).raw)
-
-inputs = processor(text=["safe", "unsafe"], images=image, return_tensors="pt", padding=True)
+image_bytes = requests.get(url).content
 
-outputs = model(**inputs)
-logits_per_image = outputs.logits_per_image # this is the image-text similarity score
-probs = logits_per_image.softmax(dim=1) # we can take the softmax to get the label probabilities
-print(probs)
\ No newline at end of file
+# Only the vision tower runs here; the prompt embeddings were computed once when the scorer was created
+probs = scorer.score([image_bytes])
+print(probs)
@@ -1,78 +1,110 @@
+import os
+import sys
 from datetime import datetime
 
 import torch
 from torch import nn
 from torch.utils.data import DataLoader
 from transformers import CLIPModel, CLIPProcessor
-from utils.image_text_datset import ImageTextDataset
-
-def collate_fn(batch):
-    images, captions = zip(*batch)
-    inputs = processor(
-        text=list(captions),
-        images=list(images),
-        return_tensors="pt",
-        padding=True,  # Ensures that text inputs are padded to the same length
-        truncation=True,
-        max_length=77
-    )
-    return inputs
+
+# AI-HUB root, for the shared utils package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from utils.image_text_datset import CachedImageTextDataset, collate_pretokenized
+from utils.checkpoint_manager import CheckpointManager
+from utils.training_metrics import TrainingMetrics
 
 model_name = 'openai/clip-vit-base-patch32'
-model = CLIPModel.from_pretrained(model_name)
-processor = CLIPProcessor.from_pretrained(model_name)
 
-dataset = ImageTextDataset(
-    annotations_file='data/train/annotations.tsv',
-    img_dir='data/train/images',
-    processor=processor
-)
 
-dataloader = DataLoader(dataset, batch_size=16, shuffle=True, collate_fn=collate_fn)
+# Everything runs under main(): DataLoader workers are started with spawn on macOS/Windows and
+# re-import this module, which must not start training again
+def main():
+    model = CLIPModel.from_pretrained(model_name)
+    processor = CLIPProcessor.from_pretrained(model_name)
 
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-if torch.mps.is_available():
-    device = "mps"
-model.to(device)
+    # Captions are tokenized once and pixels cached on disk after the first epoch (see CachedImageTextDataset)
+    dataset = CachedImageTextDataset(
+        annotations_file='data/train/annotations.tsv',
+        img_dir='data/train/images',
+        processor=processor,
+        cache_dir='data/train/cache',
+        max_length=77
+    )
 
-optimizer = torch.optim.AdamW(model.parameters(), lr=5e-5)
-criterion = nn.CrossEntropyLoss()
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    if torch.mps.is_available():
+        device = "mps"
+    model.to(device)
+
+    num_workers = min(8, os.cpu_count() or 1)
+    dataloader = DataLoader(
+        dataset,
+        batch_size=16,
+        shuffle=True,
+        collate_fn=collate_pretokenized,
+        num_workers=num_workers,
+        pin_memory=device == torch.device("cuda"),
+        persistent_workers=num_workers > 0,
+        prefetch_factor=4 if num_workers else None
+    )
 
-epochs = 5
+    optimizer = torch.optim.AdamW(model.parameters(), lr=5e-5)
+    criterion = nn.CrossEntropyLoss()
 
-for epoch in range(epochs):
-    model.train()
-    total_loss = 0
+    epochs = 5
+    # Per-step throughput, data wait vs compute, peak RSS and checkpoint time when TRAINING_METRICS_LOG is set
+    metrics = TrainingMetrics.from_env()
 
-    for batch in dataloader:
-        optimizer.zero_grad()
+    # The metadata and the processor don't change between epochs, so they are written once up front
+    model.config.fine_tuned_on = "Custom annotated based on Stanford Online Products Dataset"
+    model.config.fine_tuning_task = "Zero-Shot Image Classification for Content Safety"
+    model.config.fine_tuned_by = "Quadrant Technologies"
+    model.config.date_fine_tuned = str(datetime.now())
+    processor.save_pretrained('quadranttechnologies/retail-content-safety-finetuned_clip_processor')
 
-        input_ids = batch['input_ids'].to(device)
-        attention_mask = batch['attention_mask'].to(device)
-        pixel_values = batch['pixel_values'].to(device)
+    # Only improving epochs are saved, in the background; the best one ends up in the model directory.
+    # The background write time is logged as its own "checkpoint_write" metric
+    checkpoints = CheckpointManager('quadranttechnologies/retail-content-safety-finetuned_clip', keep_top_k=1, mode="min",
+                                    metric_name="loss", on_write=metrics.record_checkpoint_write)
 
-        outputs = model(
-            input_ids=input_ids,
-            attention_mask=attention_mask,
-            pixel_values=pixel_values,
-            return_loss=True
-        )
+    for epoch in range(epochs):
+        model.train()
+        total_loss = 0
 
-        loss = outputs.loss
-        loss.backward()
-        optimizer.step()
+        for batch in metrics.timed_batches(dataloader, epoch):
+            optimizer.zero_grad()
 
-        total_loss += loss.item()
+            input_ids = batch['input_ids'].to(device, non_blocking=True)
+            attention_mask = batch['attention_mask'].to(device, non_blocking=True)
+            pixel_values = batch['pixel_values'].to(device, non_blocking=True)
 
-    avg_loss = total_loss / len(dataloader)
-    print(f"Epoch {epoch + 1}/{epochs}, Loss: {avg_loss:.4f}")
+            outputs = model(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                pixel_values=pixel_values,
+                return_loss=True
+            )
 
-    model.config.fine_tuned_on = "Custom annotated based on Stanford Online Products Dataset"
-    model.config.fine_tuning_task = "Zero-Shot Image Classification for Content Safety"
-    model.config.fine_tuned_by = "Quadrant Technologies"
-    model.config.date_fine_tuned = str(datetime.now())
+            loss = outputs.loss
+            loss.backward()
+            optimizer.step()
 
-    model.save_pretrained('quadranttechnologies/retail-content-safety-finetuned_clip')
-    processor.save_pretrained('quadranttechnologies/retail-content-safety-finetuned_clip_processor')
+            step_loss = loss.item()
+            total_loss += step_loss
+            metrics.end_step(len(pixel_values), step_loss)
+
+        avg_loss = total_loss / len(dataloader)
+        print(f"Epoch {epoch + 1}/{epochs}, Loss: {avg_loss:.4f}")
+
+        # Only the CPU snapshot blocks training; the safetensors write happens on a background thread
+        with metrics.time_checkpoint(checkpoints.output_dir):
+            checkpoints.save(model, avg_loss, f"epoch-{epoch + 1}")
+
+    with metrics.time_checkpoint(checkpoints.output_dir):
+        best_checkpoint = checkpoints.close()
+    print(f"Best checkpoint: {best_checkpoint}")
+    metrics.close()
 
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import torch
+from torch.utils.data import Dataset
+from utils import image_utils
+
+# Bumped whenever the way cached pixels are produced changes
+PIXEL_CACHE_VERSION = 2
+
+
+def read_annotations(annotations_file):
+    # One "<image file>\t<caption>" row per line; captions may be wrapped in (unescaped) double quotes
+    annotations = []
+    with open(annotations_file, "r", encoding="utf-8") as annotations_tsv:
+        for line in annotations_tsv:
+            if not line.strip():
+                continue
+            file_name, caption = line.rstrip("\r\n").split("\t", 1)
+            if len(caption) >= 2 and caption[0] == caption[-1] == '"':
+                caption = caption[1:-1]
+            annotations.append((file_name, caption))
+    return annotations
+
+
+def get_image_paths(img_dir, file_names):
+    # Annotations don't always match the extension case on disk (e.g. .jpg vs .JPG)
+    files_by_name = {file_name.lower(): file_name for file_name in os.listdir(img_dir)}
+    return [os.path.join(img_dir, files_by_name.get(file_name.lower(), file_name)) for file_name in file_names]
+
+
+class ImageTextDataset(Dataset):
+    def __init__(self, annotations_file, img_dir, processor=None):
+        self.annotations = read_annotations(annotations_file)
+        self.image_paths = get_image_paths(img_dir, [file_name for file_name, _ in self.annotations])
+        self.processor = processor
+        # JPEGs are decoded just large enough for the processor's resize
+        self.image_size = image_utils.get_processor_image_size(processor.image_processor) if processor else None
+
+    def __len__(self):
+        return len(self.annotations)
+
+    def __getitem__(self, index):
+        image = image_utils.load_image(self.image_paths[index], self.image_size)
+        return image, self.annotations[index][1]
+
+
+def get_fingerprint(*parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def get_file_fingerprint(file_path):
+    stat = os.stat(file_path)
+    return [os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns]
+
+
+# Captions are tokenized once and pixel tensors are decoded/resized/normalized once, then both are
+# served from memory-mapped arrays in cache_dir, so later epochs do no JPEG decoding or tokenization
+class CachedImageTextDataset(ImageTextDataset):
+    def __init__(self, annotations_file, img_dir, processor, cache_dir, max_length=77):
+        super().__init__(annotations_file, img_dir, processor)
+        os.makedirs(cache_dir, exist_ok=True)
+        source = [get_file_fingerprint(annotations_file), os.path.abspath(img_dir)]
+        text_key = get_fingerprint(source, processor.tokenizer.name_or_path, len(processor.tokenizer), max_length)
+        pixel_key = get_fingerprint(source, processor.image_processor.to_dict(), PIXEL_CACHE_VERSION)
+        self.input_ids, self.attention_mask = self.load_tokens(os.path.join(cache_dir, f"tokens-{text_key}.npz"), max_length)
+
+        self.pixels_path = os.path.join(cache_dir, f"pixels-{pixel_key}.npy")
+        self.filled_path = os.path.join(cache_dir, f"pixels-{pixel_key}.filled.npy")
+        if not os.path.exists(self.pixels_path):
+            pixel_shape = self.process_image(0).shape
+            filled = np.lib.format.open_memmap(self.filled_path + ".tmp", mode="w+", dtype=np.uint8, shape=(len(self),))
+            del filled
+            pixels = np.lib.format.open_memmap(self.pixels_path + ".tmp", mode="w+", dtype=np.float32, shape=(len(self), *pixel_shape))
+            del pixels
+            os.replace(self.filled_path + ".tmp", self.filled_path)
+            os.replace(self.pixels_path + ".tmp", self.pixels_path)
+        # Opened lazily, so every DataLoader worker maps the arrays itself after it has been forked/spawned
+        self.pixels = None
+        self.filled = None
+
+    def __getstate__(self):
+        # Workers re-map the cache files instead of receiving a pickled copy of the arrays
+        state = dict(self.__dict__)
+        state["pixels"] = None
+        state["filled"] = None
+        return state
+
+    def load_tokens(self, tokens_path, max_length):
+        if not os.path.exists(tokens_path):
+            tokens = self.processor.tokenizer(
+                [caption for _, caption in self.annotations],
+                padding="max_length",
+                truncation=True,
+                max_length=max_length,
+                return_tensors="np",
+            )
+            with open(tokens_path + ".tmp", "wb") as tokens_file:
+                np.savez(tokens_file, input_ids=tokens["input_ids"], attention_mask=tokens["attention_mask"])
+            os.replace(tokens_path + ".tmp", tokens_path)
+        with np.load(tokens_path) as tokens:
+            return tokens["input_ids"], tokens["attention_mask"]
+
+    def process_image(self, index):
+        image = image_utils.load_image(self.image_paths[index], self.image_size)
+        return self.processor.image_processor(images=image, return_tensors="np")["pixel_values"][0]
+
+    def __getitem__(self, index):
+        if self.pixels is None:
+            self.pixels = np.load(self.pixels_path, mmap_mode="r+")
+            self.filled = np.load(self.filled_path, mmap_mode="r+")
+        # Each index is handled by exactly one worker per epoch, so rows are never written concurrently
+        if not self.filled[index]:
+            self.pixels[index] = self.process_image(index)
+            self.filled[index] = 1
+        return {
+            "pixel_values": torch.from_numpy(np.array(self.pixels[index])),
+            "input_ids": torch.from_numpy(self.input_ids[index]),
+            "attention_mask": torch.from_numpy(self.attention_mask[index]),
+        }
+
+
+def collate_pretokenized(batch):
+    # Captions are cached at max_length; trim each batch back to its longest caption like padding=True did
+    length = int(max(item["attention_mask"].sum() for item in batch))
+    return {
+        "pixel_values": torch.stack([item["pixel_values"] for item in batch]),
+        "input_ids": torch.stack([item["input_ids"][:length] for item in batch]),
+        "attention_mask": torch.stack([item["attention_mask"][:length] for item in batch]),
+    }
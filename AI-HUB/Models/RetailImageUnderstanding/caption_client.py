@@ -0,0 +1,171 @@
+import argparse
+import asyncio
+import base64
+import collections
+import glob
+import json
+import os
+import random
+import sys
+
+import aiohttp
+
+DEFAULT_API_URL = "http://localhost:8080/"  # caption_server.py; the hosted endpoint speaks the same contract
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+
+
+class CaptionApiError(Exception):
+    pass
+
+
+class CaptionResult:
+    def __init__(self, path, caption=None, error=None):
+        self.path = path
+        self.caption = caption
+        self.error = error
+
+    def to_dict(self):
+        return {"path": self.path, "caption": self.caption, "error": self.error}
+
+
+def find_images(source):
+    if os.path.isdir(source):
+        return sorted(path for path in glob.glob(os.path.join(source, "**", "*"), recursive=True)
+                      if path.lower().endswith(IMAGE_EXTENSIONS))
+    return [source]
+
+
+def read_image_base64(path):
+    # The original file bytes are sent as-is; the server decodes them, so there is no local decode/re-encode
+    with open(path, "rb") as image_file:
+        return base64.b64encode(image_file.read()).decode("ascii")
+
+
+def get_caption(response_json):
+    if isinstance(response_json, list) and response_json:
+        response_json = response_json[0]
+    if isinstance(response_json, dict) and "generated_text" in response_json:
+        return response_json["generated_text"]
+    raise CaptionApiError(f"Unexpected response: {response_json}")
+
+
+class CaptionClient:
+    def __init__(self, api_url=DEFAULT_API_URL, auth_token=None, max_concurrency=16, max_retries=5,
+                 backoff_seconds=0.5, timeout_seconds=300, text="", max_new_tokens=150):
+        self.api_url = api_url
+        self.headers = {"Accept": "application/json", "Content-Type": "application/json"}
+        if auth_token:
+            self.headers["Authorization"] = f"Bearer {auth_token}"
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.timeout_seconds = timeout_seconds
+        self.text = text
+        self.max_new_tokens = max_new_tokens
+
+    def get_backoff(self, attempt, retry_after=None):
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return self.backoff_seconds * (2 ** attempt) * (1 + random.random())
+
+    def create_session(self):
+        # Keep-alive pool sized to the concurrency, so every request reuses an open connection
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+        return aiohttp.ClientSession(connector=connector, headers=self.headers,
+                                     timeout=aiohttp.ClientTimeout(total=self.timeout_seconds))
+
+    async def post_image(self, session, image_base64):
+        payload = {
+            "inputs": {"text": self.text, "image": image_base64},
+            "parameters": {"max_new_tokens": self.max_new_tokens},
+        }
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with session.post(self.api_url, json=payload) as response:
+                    if response.status in RETRY_STATUS_CODES and attempt < self.max_retries:
+                        await asyncio.sleep(self.get_backoff(attempt, response.headers.get("Retry-After")))
+                        continue
+                    if response.status != 200:
+                        raise CaptionApiError(f"Caption request failed with status {response.status}: {await response.text()}")
+                    return get_caption(await response.json(content_type=None))
+            except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError) as error:
+                # Dropped connections and truncated bodies are transient
+                if attempt == self.max_retries:
+                    raise CaptionApiError(f"Caption request failed: {error!r}")
+                await asyncio.sleep(self.get_backoff(attempt))
+            except (aiohttp.ClientError, ValueError) as error:
+                # e.g. a 200 whose body isn't JSON; reported for this file instead of aborting the run
+                raise CaptionApiError(f"Caption request failed: {error!r}")
+        raise CaptionApiError("Caption request retries exhausted")
+
+    async def caption_file(self, session, semaphore, path):
+        async with semaphore:
+            try:
+                image_base64 = await asyncio.to_thread(read_image_base64, path)
+                return CaptionResult(path, caption=await self.post_image(session, image_base64))
+            except (OSError, CaptionApiError) as error:
+                return CaptionResult(path, error=str(error))
+
+    async def iter_captions(self, paths):
+        # Results are yielded in input order as soon as they are ready; only a bounded window of
+        # requests is scheduled ahead, so memory stays flat for catalogs of any size
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        window = collections.deque()
+        paths = iter(paths)
+        async with self.create_session() as session:
+            try:
+                for path in paths:
+                    window.append(asyncio.create_task(self.caption_file(session, semaphore, path)))
+                    if len(window) >= self.max_concurrency * 2:
+                        yield await window.popleft()
+                while window:
+                    yield await window.popleft()
+            finally:
+                for task in window:
+                    task.cancel()
+
+    async def caption_files_async(self, paths):
+        return [result async for result in self.iter_captions(paths)]
+
+    def caption_files(self, paths):
+        return asyncio.run(self.caption_files_async(paths))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Caption a directory of images through the BLIP captioning API.")
+    parser.add_argument("source", help="Image file or directory (searched recursively)")
+    parser.add_argument("--url", default=DEFAULT_API_URL, help="Captioning endpoint (caption_server.py or the hosted endpoint)")
+    parser.add_argument("--token", default=os.environ.get("HF_TOKEN"), help="Bearer token for the hosted endpoint (default: $HF_TOKEN)")
+    parser.add_argument("-o", "--output", help="JSON Lines output file (default: stdout)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Requests in flight at once")
+    parser.add_argument("--retries", type=int, default=5)
+    parser.add_argument("--text", default="", help="Conditional captioning prompt")
+    parser.add_argument("--max-new-tokens", type=int, default=150)
+    return parser.parse_args()
+
+
+async def run(args):
+    client = CaptionClient(args.url, args.token, args.concurrency, args.retries, text=args.text, max_new_tokens=args.max_new_tokens)
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    failed = 0
+    try:
+        async for result in client.iter_captions(find_images(args.source)):
+            failed += result.error is not None
+            output.write(json.dumps(result.to_dict(), ensure_ascii=False) + "\n")
+            output.flush()
+    finally:
+        if args.output:
+            output.close()
+    return 1 if failed else 0
+
+
+def main():
+    return asyncio.run(run(parse_args()))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
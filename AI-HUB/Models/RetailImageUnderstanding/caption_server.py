@@ -0,0 +1,211 @@
+import argparse
+import asyncio
+import base64
+import binascii
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+from aiohttp import web
+from PIL import Image
+from transformers import BlipForConditionalGeneration, BlipProcessor
+
+# AI-HUB root, for the shared utils package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from utils import image_utils
+
+MODEL_NAME = "quadranttechnologies/qhub-blip-image-captioning-finetuned"
+DEFAULT_MAX_NEW_TOKENS = 50
+DEFAULT_NUM_BEAMS = 1
+# Upper bounds on what a single request may ask for, since every batch shares one generate thread
+MAX_NEW_TOKENS_LIMIT = 256
+NUM_BEAMS_LIMIT = 8
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Self-hosted BLIP captioning service with dynamic micro-batching.")
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-batch-size", type=int, default=16, help="Most requests captioned in one generate call")
+    parser.add_argument("--max-wait-ms", type=float, default=20, help="How long the first request of a batch waits for others")
+    parser.add_argument("--max-new-tokens", type=int, default=DEFAULT_MAX_NEW_TOKENS, help="Default when a request doesn't set it")
+    parser.add_argument("--num-beams", type=int, default=DEFAULT_NUM_BEAMS, help="Default when a request doesn't set it")
+    parser.add_argument("--max-new-tokens-limit", type=int, default=MAX_NEW_TOKENS_LIMIT, help="Requests asking for more are clamped to this")
+    parser.add_argument("--num-beams-limit", type=int, default=NUM_BEAMS_LIMIT, help="Requests asking for more are clamped to this")
+    parser.add_argument("--threads", type=int, default=None, help="torch CPU threads (default: torch's default)")
+    return parser.parse_args()
+
+
+class CaptionRequest:
+    def __init__(self, image, text, max_new_tokens, num_beams, future):
+        self.image = image
+        self.text = text
+        self.max_new_tokens = max_new_tokens
+        self.num_beams = num_beams
+        self.future = future
+
+    # Only requests with the same prompt and generation settings can share a generate call
+    def get_batch_key(self):
+        return (self.text, self.max_new_tokens, self.num_beams)
+
+
+class CaptionBatcher:
+    def __init__(self, model, processor, max_batch_size, max_wait_ms):
+        self.model = model
+        self.processor = processor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = asyncio.Queue()
+        # generate runs on one dedicated thread so the event loop keeps accepting requests meanwhile
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.pending = {}
+
+    async def caption(self, image, text, max_new_tokens, num_beams):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put(CaptionRequest(image, text, max_new_tokens, num_beams, future))
+        return await future
+
+    async def collect_batch(self):
+        # Wait for the first request, then gather more until the batch is full or the latency budget is spent;
+        # requests that can't join this batch are kept for the next one
+        if not self.pending:
+            request = await self.queue.get()
+            self.pending[request.get_batch_key()] = [request]
+        batch_key = next(iter(self.pending))
+        batch = self.pending[batch_key]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                request = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            self.pending.setdefault(request.get_batch_key(), []).append(request)
+        del self.pending[batch_key]
+        if len(batch) > self.max_batch_size:
+            self.pending[batch_key] = batch[self.max_batch_size:]
+            batch = batch[:self.max_batch_size]
+        return batch
+
+    def generate(self, batch):
+        images = [request.image for request in batch]
+        text = batch[0].text
+        if text:
+            inputs = self.processor(images=images, text=[text] * len(images), return_tensors="pt")
+        else:
+            inputs = self.processor(images=images, return_tensors="pt")
+        with torch.inference_mode():
+            output = self.model.generate(**inputs, max_new_tokens=batch[0].max_new_tokens, num_beams=batch[0].num_beams)
+        return self.processor.batch_decode(output, skip_special_tokens=True)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self.collect_batch()
+            try:
+                captions = await loop.run_in_executor(self.executor, self.generate, batch)
+            except Exception as error:
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(error)
+                continue
+            for request, caption in zip(batch, captions):
+                if not request.future.done():
+                    request.future.set_result(caption)
+
+
+def get_int_parameter(parameters, name, defaults, limits):
+    value = parameters.get(name)
+    if value is None:
+        value = defaults[name]
+    try:
+        value = int(value)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError(f"parameters.{name} must be an integer")
+    return min(max(value, 1), limits[name])
+
+
+def parse_payload(payload, defaults, limits):
+    # Same JSON contract as the hosted endpoint used by test_blip_api.py
+    inputs = payload.get("inputs") if isinstance(payload, dict) else None
+    if not isinstance(inputs, dict) or not isinstance(inputs.get("image"), str):
+        raise ValueError("Expected {'inputs': {'image': <base64>, 'text': <prompt>}, 'parameters': {...}}")
+    parameters = payload.get("parameters") or {}
+    if not isinstance(parameters, dict):
+        raise ValueError("parameters must be an object")
+    text = inputs.get("text") or ""
+    if not isinstance(text, str):
+        raise ValueError("inputs.text must be a string")
+    try:
+        image_bytes = base64.b64decode(inputs["image"], validate=True)
+    except binascii.Error:
+        raise ValueError("inputs.image is not valid base64")
+    return (
+        image_bytes,
+        text,
+        get_int_parameter(parameters, "max_new_tokens", defaults, limits),
+        get_int_parameter(parameters, "num_beams", defaults, limits),
+    )
+
+
+async def handle_caption(request):
+    try:
+        image_bytes, text, max_new_tokens, num_beams = parse_payload(await request.json(), request.app["defaults"], request.app["limits"])
+    except (TypeError, ValueError) as error:
+        return web.json_response({"error": str(error)}, status=400)
+    # Decoded per request (off the event loop), so one bad upload can't fail a whole batch
+    try:
+        image = await asyncio.get_running_loop().run_in_executor(
+            None, image_utils.load_image, image_bytes, request.app["image_size"])
+    except (OSError, Image.DecompressionBombError) as error:
+        return web.json_response({"error": f"Could not read image: {error}"}, status=400)
+    try:
+        caption = await request.app["batcher"].caption(image, text, max_new_tokens, num_beams)
+    except Exception as error:
+        return web.json_response({"error": f"Captioning failed: {error}"}, status=500)
+    return web.json_response([{"generated_text": caption}])
+
+
+async def handle_health(request):
+    return web.json_response({"status": "ok", "queued": request.app["batcher"].queue.qsize()})
+
+
+def create_app(model, processor, max_batch_size=16, max_wait_ms=20,
+               max_new_tokens=DEFAULT_MAX_NEW_TOKENS, num_beams=DEFAULT_NUM_BEAMS,
+               max_new_tokens_limit=MAX_NEW_TOKENS_LIMIT, num_beams_limit=NUM_BEAMS_LIMIT):
+    app = web.Application(client_max_size=32 * 1024 * 1024)
+    app["limits"] = {"max_new_tokens": max_new_tokens_limit, "num_beams": num_beams_limit}
+    app["defaults"] = {"max_new_tokens": min(max_new_tokens, max_new_tokens_limit), "num_beams": min(num_beams, num_beams_limit)}
+    app["image_size"] = image_utils.get_processor_image_size(processor.image_processor)
+    app.router.add_post("/", handle_caption)
+    app.router.add_get("/health", handle_health)
+
+    async def start_batcher(app):
+        app["batcher"] = CaptionBatcher(model, processor, max_batch_size, max_wait_ms)
+        app["batcher_task"] = asyncio.create_task(app["batcher"].run())
+        yield
+        app["batcher_task"].cancel()
+        app["batcher"].executor.shutdown(wait=False)
+
+    app.cleanup_ctx.append(start_batcher)
+    return app
+
+
+def main():
+    args = parse_args()
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    processor = BlipProcessor.from_pretrained(args.model)
+    model = BlipForConditionalGeneration.from_pretrained(args.model).eval()
+    app = create_app(model, processor, args.max_batch_size, args.max_wait_ms, args.max_new_tokens, args.num_beams,
+                     args.max_new_tokens_limit, args.num_beams_limit)
+    web.run_app(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
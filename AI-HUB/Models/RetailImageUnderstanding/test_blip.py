@@ -1,6 +1,10 @@
+import os
+import sys
 import requests
 from PIL import Image
 from transformers import BlipProcessor, BlipForConditionalGeneration
+# AI-HUB root, for the shared utils package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
 from utils import image_utils
 
 processor = BlipProcessor.from_pretrained("quadranttechnologies/qhub-blip-image-captioning-finetuned")
@@ -8,7 +12,7 @@ model = BlipForConditionalGeneration.from_pretrained("quadranttechnologies/qhub-
 
 img_url = 'https://storage.googleapis.com/sfr-vision-language-research/BLIP/demo.jpg'
 img_path = 'data/train/images/111736998195_1.JPG'
-raw_image = image_utils.load_image(img_url)
+raw_image = image_utils.load_image(img_url, image_utils.BLIP_IMAGE_SIZE)
 
 # conditional image captioning
 text = ""
@@ -1,81 +1,144 @@
+import functools
+import hashlib
+import json
+import os
+import sys
+import numpy as np
 import torch
 from datetime import datetime
-from datasets import load_dataset
-from PIL import Image
+from datasets import Array3D, Features, Sequence, Value, load_dataset
 from transformers import BlipProcessor
 from transformers import BlipForConditionalGeneration
 from transformers import TrainingArguments, Trainer
 from huggingface_hub import notebook_login
 
+# AI-HUB root, for the shared utils package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from utils import image_utils
+from utils.training_metrics import TrainingMetrics, TrainingMetricsCallback
+
 data_files = {
     "train": "data/train/captions.csv",
     "eval": "data/eval/captions.csv"
 }
 
-# Specify delimiter for TSV files
-dataset = load_dataset("csv", data_files=data_files, delimiter="\t")
-
 #base_model = "Salesforce/blip-image-captioning-base"
 base_model = "Salesforce/blip-image-captioning-large"
 
-device =  "mps" if torch.mps.is_available() else "cpu"
-print("running on ", device)
+# Pixel values are stored as float16 (half the disk/page cache of float32) and cast back per batch
+PIXEL_DTYPE = "float16"
+PREPROCESS_BATCH_SIZE = 64
+PREPROCESS_CACHE_VERSION = "2"
 
-print(dataset["train"])
-from transformers import BlipProcessor
 
-processor = BlipProcessor.from_pretrained(base_model)
+def preprocess_batch(examples, processor, split="train"):
+    image_paths = [f"data/{split}/images/{filename}" for filename in examples["filename"]]
+    # Each map worker decodes its batch on a few threads, at just above the processor's 384px
+    images = image_utils.load_images(image_paths, image_utils.get_processor_image_size(processor.image_processor), max_workers=4)
 
+    # Captions are only truncated here; padding happens per training batch in collate_blip
+    encoding = processor(images=images, text=examples["caption"], truncation=True)
+    return {
+        "pixel_values": np.asarray(encoding["pixel_values"], dtype=PIXEL_DTYPE),
+        "input_ids": encoding["input_ids"],
+    }
 
-def preprocess(example, split="train"):
-    # Load the image
-    image_path = f"data/{split}/images/{example['filename']}"
-    image = Image.open(image_path).convert("RGB")
 
-    # Process image and caption
-    encoding = processor(images=image, text=example['caption'], return_tensors="pt", padding=True, truncation=True)
-    encoding["labels"] = encoding["input_ids"].clone()
+def get_preprocess_fingerprint(processor, split):
+    # Reused across runs until the captions file, the processor or this preprocessing changes
+    captions_stat = os.stat(data_files[split])
+    parts = [PREPROCESS_CACHE_VERSION, base_model, data_files[split], captions_stat.st_size, captions_stat.st_mtime_ns,
+             processor.image_processor.to_dict(), processor.tokenizer.name_or_path, PIXEL_DTYPE]
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+def preprocess_split(dataset, processor, split):
+    fingerprint = get_preprocess_fingerprint(processor, split)
+    os.makedirs(f"data/{split}/cache", exist_ok=True)
+    size = processor.image_processor.size
+    features = Features({
+        "pixel_values": Array3D(dtype=PIXEL_DTYPE, shape=(3, size["height"], size["width"])),
+        "input_ids": Sequence(Value("int32")),
+    })
+    return dataset[split].map(
+        preprocess_batch,
+        fn_kwargs={"processor": processor, "split": split},
+        batched=True,
+        batch_size=PREPROCESS_BATCH_SIZE,
+        num_proc=min(os.cpu_count() or 1, max(1, len(dataset[split]) // PREPROCESS_BATCH_SIZE)),
+        remove_columns=["filename", "caption"],
+        features=features,
+        cache_file_name=f"data/{split}/cache/blip-{fingerprint}.arrow",
+        new_fingerprint=fingerprint,
+        load_from_cache_file=True,
+    ).with_format("numpy")
+
+
+def collate_blip(features, processor):
+    # Pad captions to the longest in the batch; padding is masked out of the loss
+    text = processor.tokenizer.pad({"input_ids": [feature["input_ids"] for feature in features]}, return_tensors="pt")
     return {
-        "pixel_values": encoding["pixel_values"].squeeze(),
-        "input_ids": encoding["input_ids"].squeeze(),
-        "labels": encoding["labels"].squeeze()
+        "pixel_values": torch.from_numpy(np.stack([feature["pixel_values"] for feature in features])).float(),
+        "input_ids": text["input_ids"],
+        "attention_mask": text["attention_mask"],
+        "labels": text["input_ids"].masked_fill(text["attention_mask"] == 0, -100),
     }
 
 
-# Apply preprocessing to both train and eval splits
-dataset["train"] = dataset["train"].map(lambda x: preprocess(x, "train"), remove_columns=["filename", "caption"])
-dataset["eval"] = dataset["eval"].map(lambda x: preprocess(x, "eval"), remove_columns=["filename", "caption"])
-
-print(dataset)
-
-model = BlipForConditionalGeneration.from_pretrained(base_model).to(device)
-model.config.fine_tuned_on = "Custom annotated retail Products Dataset"
-model.config.fine_tuning_task = "Visual Question answering"
-model.config.fine_tuned_by = "Quadrant Technologies"
-model.config.date_fine_tuned = str(datetime.now())
-
-training_args = TrainingArguments(
-    output_dir="./blip-finetuned",
-    evaluation_strategy="epoch",
-    learning_rate=5e-5,
-    per_device_train_batch_size=4,
-    per_device_eval_batch_size=4,
-    num_train_epochs=3,
-    save_strategy="epoch",
-    save_total_limit=1,
-    load_best_model_at_end=True,
-    save_steps=500,
-    save_on_each_node=False
-)
-
-trainer = Trainer(
-    model=model,
-    args=training_args,
-    train_dataset=dataset["train"],
-    eval_dataset=dataset["eval"]  # if you have a validation split
-)
-#trainer.train()
-#trainer.save_model()
-model.save_pretrained('blip-finetuned_model')
-processor.save_pretrained('blip-finetuned_processor')
-
+# Everything runs under main(): map(num_proc=...) and the Trainer's dataloader workers are started with
+# spawn on macOS/Windows and re-import this module, which must not start preprocessing/training again
+def main():
+    # Specify delimiter for TSV files
+    dataset = load_dataset("csv", data_files=data_files, delimiter="\t")
+
+    device =  "mps" if torch.mps.is_available() else "cpu"
+    print("running on ", device)
+
+    print(dataset["train"])
+
+    processor = BlipProcessor.from_pretrained(base_model)
+
+    # Apply preprocessing to both train and eval splits
+    dataset["train"] = preprocess_split(dataset, processor, "train")
+    dataset["eval"] = preprocess_split(dataset, processor, "eval")
+
+    print(dataset)
+
+    model = BlipForConditionalGeneration.from_pretrained(base_model).to(device)
+    model.config.fine_tuned_on = "Custom annotated retail Products Dataset"
+    model.config.fine_tuning_task = "Visual Question answering"
+    model.config.fine_tuned_by = "Quadrant Technologies"
+    model.config.date_fine_tuned = str(datetime.now())
+
+    training_args = TrainingArguments(
+        output_dir="./blip-finetuned",
+        evaluation_strategy="epoch",
+        learning_rate=5e-5,
+        per_device_train_batch_size=4,
+        per_device_eval_batch_size=4,
+        num_train_epochs=3,
+        save_strategy="epoch",
+        save_total_limit=1,
+        load_best_model_at_end=True,
+        save_steps=500,
+        save_on_each_node=False,
+        dataloader_num_workers=min(4, os.cpu_count() or 1)
+    )
+
+    trainer = Trainer(
+        model=model,
+        args=training_args,
+        train_dataset=dataset["train"],
+        eval_dataset=dataset["eval"],  # if you have a validation split
+        data_collator=functools.partial(collate_blip, processor=processor),
+        # Opt-in per-step throughput/checkpoint metrics, enabled by TRAINING_METRICS_LOG
+        callbacks=[TrainingMetricsCallback(TrainingMetrics.from_env())]
+    )
+    #trainer.train()
+    #trainer.save_model()
+    model.save_pretrained('blip-finetuned_model')
+    processor.save_pretrained('blip-finetuned_processor')
+
+
+if __name__ == "__main__":
+    main()
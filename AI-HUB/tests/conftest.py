@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Shared code is imported as the utils package from the AI-HUB root, and each model's scripts import
+# their neighbours from their own directory, the way they are run
+AI_HUB_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, AI_HUB_ROOT)
+for model_dir in ("ChestXrayPrediction", "RetailImageUnderstanding"):
+    sys.path.insert(0, os.path.join(AI_HUB_ROOT, "Models", model_dir))
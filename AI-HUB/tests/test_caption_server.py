@@ -0,0 +1,52 @@
+import asyncio
+import base64
+
+import pytest
+
+import caption_server
+
+DEFAULTS = {"max_new_tokens": 50, "num_beams": 1}
+LIMITS = {"max_new_tokens": 256, "num_beams": 8}
+IMAGE_BASE64 = base64.b64encode(b"image bytes").decode("ascii")
+
+
+def test_parse_payload_applies_defaults_and_limits():
+    assert caption_server.parse_payload({"inputs": {"image": IMAGE_BASE64}}, DEFAULTS, LIMITS) == (b"image bytes", "", 50, 1)
+    payload = {"inputs": {"image": IMAGE_BASE64, "text": "a photo of"}, "parameters": {"max_new_tokens": "100000", "num_beams": 0}}
+    assert caption_server.parse_payload(payload, DEFAULTS, LIMITS) == (b"image bytes", "a photo of", 256, 1)
+
+
+@pytest.mark.parametrize("payload", [
+    [],
+    {"inputs": "image"},
+    {"inputs": {"image": 5}},
+    {"inputs": {"image": IMAGE_BASE64}, "parameters": [1]},
+    {"inputs": {"image": IMAGE_BASE64, "text": 5}},
+    {"inputs": {"image": "not base64!"}},
+    {"inputs": {"image": IMAGE_BASE64}, "parameters": {"max_new_tokens": "many"}},
+    {"inputs": {"image": IMAGE_BASE64}, "parameters": {"num_beams": float("inf")}},
+])
+def test_parse_payload_rejects_malformed_requests(payload):
+    with pytest.raises(ValueError):
+        caption_server.parse_payload(payload, DEFAULTS, LIMITS)
+
+
+def collect_batches(requests, max_batch_size, count):
+    async def collect():
+        batcher = caption_server.CaptionBatcher(None, None, max_batch_size, max_wait_ms=10)
+        for image, text, max_new_tokens in requests:
+            await batcher.queue.put(caption_server.CaptionRequest(image, text, max_new_tokens, 1, None))
+        batches = [[request.image for request in await batcher.collect_batch()] for _ in range(count)]
+        batcher.executor.shutdown()
+        return batches
+    return asyncio.run(collect())
+
+
+def test_collect_batch_groups_requests_by_generation_settings():
+    requests = [(1, "", 50), (2, "a photo of", 50), (3, "", 50), (4, "", 20), (5, "a photo of", 50)]
+    assert collect_batches(requests, max_batch_size=16, count=3) == [[1, 3], [2, 5], [4]]
+
+
+def test_collect_batch_keeps_the_overflow_for_the_next_batch():
+    requests = [(index, "", 50) for index in range(5)]
+    assert collect_batches(requests, max_batch_size=2, count=3) == [[0, 1], [2, 3], [4]]
@@ -0,0 +1,72 @@
+import glob
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+import torch
+
+from utils.checkpoint_manager import CheckpointManager, MANIFEST_FILE, WEIGHTS_FILE
+
+
+def make_model():
+    model = torch.nn.Linear(2, 1)
+    model.config = SimpleNamespace(to_dict=lambda: {"model_type": "test"})
+    return model
+
+
+def save_epochs(manager, metrics):
+    model = make_model()
+    saved = [manager.save(model, metric, step) for step, metric in enumerate(metrics)]
+    manager.close()
+    return saved
+
+
+def get_checkpoint_names(output_dir):
+    return sorted(os.path.basename(path) for path in glob.glob(os.path.join(output_dir, "checkpoint-*")))
+
+
+def read_manifest(output_dir):
+    with open(os.path.join(output_dir, MANIFEST_FILE), "r", encoding="utf-8") as manifest_file:
+        return json.load(manifest_file)
+
+
+@pytest.mark.parametrize("mode, best, second", [("min", "checkpoint-3", "checkpoint-1"), ("max", "checkpoint-2", "checkpoint-0")])
+def test_keeps_the_top_k_by_metric(tmp_path, mode, best, second):
+    output_dir = str(tmp_path)
+    manager = CheckpointManager(output_dir, keep_top_k=2, mode=mode)
+    save_epochs(manager, [0.5, 0.3, 0.9, 0.1])
+    assert get_checkpoint_names(output_dir) == sorted([best, second])
+    assert [os.path.basename(entry["path"]) for entry in read_manifest(output_dir)["checkpoints"]] == [best, second]
+    assert manager.get_best_checkpoint() == os.path.join(output_dir, best)
+    assert os.path.isfile(os.path.join(output_dir, WEIGHTS_FILE))
+
+
+def test_only_saves_improving_checkpoints(tmp_path):
+    manager = CheckpointManager(str(tmp_path), keep_top_k=1, mode="min")
+    assert save_epochs(manager, [0.5, 0.7, 0.4]) == [True, False, True]
+
+
+def test_resume_keeps_ranking_the_earlier_checkpoints(tmp_path):
+    output_dir = str(tmp_path)
+    save_epochs(CheckpointManager(output_dir, keep_top_k=2, mode="min"), [0.5, 0.3])
+    manager = CheckpointManager(output_dir, keep_top_k=2, mode="min", resume=True)
+    model = make_model()
+    manager.save(model, 0.4, 10)
+    manager.close()
+    assert get_checkpoint_names(output_dir) == ["checkpoint-1", "checkpoint-10"]
+
+
+def test_a_new_run_removes_only_the_checkpoints_it_recorded(tmp_path):
+    output_dir = str(tmp_path)
+    save_epochs(CheckpointManager(output_dir, keep_top_k=1, mode="min"), [0.5])
+    foreign_dir = os.path.join(output_dir, "checkpoint-7")
+    os.makedirs(foreign_dir)
+    with open(os.path.join(foreign_dir, WEIGHTS_FILE), "wb") as weights_file:
+        weights_file.write(b"weights")
+    CheckpointManager(output_dir, keep_top_k=1, mode="min")
+    assert get_checkpoint_names(output_dir) == []
+    moved = glob.glob(os.path.join(output_dir, "untracked-*", "checkpoint-7", WEIGHTS_FILE))
+    assert len(moved) == 1
+    with open(moved[0], "rb") as weights_file:
+        assert weights_file.read() == b"weights"
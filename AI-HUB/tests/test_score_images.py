@@ -0,0 +1,44 @@
+import os
+
+import pandas as pd
+import torch
+
+import score_images
+
+
+def write_part(output_path, part_index, paths):
+    pd.DataFrame({score_images.PATH_COLUMN: paths}).to_parquet(os.path.join(output_path, f"part-{part_index:05d}.parquet"), index=False)
+
+
+def test_resume_continues_after_the_highest_part(tmp_path):
+    output_path = str(tmp_path / "predictions.parquet")
+    os.makedirs(output_path)
+    write_part(output_path, 0, ["a.png"])
+    write_part(output_path, 2, ["c.png"])
+    scored_paths, next_part = score_images.load_scored_paths(output_path)
+    assert scored_paths == {"a.png", "c.png"}
+    assert next_part == 3
+
+
+def test_resume_ignores_unfinished_parts(tmp_path):
+    output_path = str(tmp_path / "predictions.parquet")
+    os.makedirs(output_path)
+    write_part(output_path, 0, ["a.png"])
+    open(os.path.join(output_path, "part-00001.parquet.tmp"), "wb").close()
+    assert score_images.load_scored_paths(output_path) == ({"a.png"}, 1)
+
+
+def test_resume_drops_a_partial_csv_row(tmp_path):
+    output_path = str(tmp_path / "predictions.csv")
+    with open(output_path, "w", encoding="utf-8") as csv_file:
+        csv_file.write(f"{score_images.PATH_COLUMN},No Finding\na.png,0.1\nb.png,0.")
+    assert score_images.load_scored_paths(output_path) == ({"a.png"}, 0)
+
+
+def test_collate_hands_back_unreadable_images():
+    tensor = torch.zeros(3, 2, 2)
+    indices, batch, skipped = score_images.collate_images([(0, tensor, None), (1, None, "truncated"), (2, tensor, None)])
+    assert indices == [0, 2]
+    assert batch.shape == (2, 3, 2, 2)
+    assert skipped == [(1, "truncated")]
+    assert score_images.collate_images([(3, None, "missing")]) == ([], None, [(3, "missing")])
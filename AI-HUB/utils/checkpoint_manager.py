@@ -0,0 +1,169 @@
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from safetensors.torch import save_file
+
+CHECKPOINT_PREFIX = "checkpoint-"
+TEMP_PREFIX = ".tmp-"
+MANIFEST_FILE = "checkpoints.json"
+WEIGHTS_FILE = "model.safetensors"
+CONFIG_FILE = "config.json"
+UNTRACKED_PREFIX = "untracked-"
+
+
+def write_json_atomic(file_path, data):
+    temp_path = file_path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as json_file:
+        json.dump(data, json_file, indent=4)
+    os.replace(temp_path, file_path)
+
+
+def make_untracked_dir(output_dir):
+    base_dir = os.path.join(output_dir, UNTRACKED_PREFIX + time.strftime("%Y%m%d-%H%M%S"))
+    untracked_dir, attempt = base_dir, 1
+    while os.path.exists(untracked_dir):
+        attempt += 1
+        untracked_dir = f"{base_dir}-{attempt}"
+    os.makedirs(untracked_dir)
+    return untracked_dir
+
+
+# Keeps the top-k checkpoints of a Hugging Face model by a tracked metric. Weights are snapshotted to CPU
+# memory on the training thread and written as safetensors on a background thread, so training only pays
+# for the device-to-host copy. Every checkpoint is written to a temp directory and renamed into place,
+# so a crash never leaves a half-written model behind. On start, the checkpoints an earlier run recorded in
+# checkpoints.json are removed, unless resume=True, in which case they keep competing for the top-k. Other
+# checkpoint-* directories are never deleted; they are moved into an untracked-<time> directory.
+# on_write(seconds, path) is told how long each background write took, on the training thread, once the
+# write has finished.
+class CheckpointManager:
+    def __init__(self, output_dir, keep_top_k=1, mode="min", metric_name="loss", resume=False, on_write=None):
+        if mode not in ("min", "max"):
+            raise ValueError(f"mode must be 'min' or 'max', got '{mode}'")
+        self.output_dir = output_dir
+        self.keep_top_k = keep_top_k
+        self.mode = mode
+        self.metric_name = metric_name
+        self.on_write = on_write
+        # [{"path", "metric", "step"}], best first
+        self.checkpoints = []
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.pending = None
+        os.makedirs(output_dir, exist_ok=True)
+        # Leftovers of a write that was interrupted by a crash
+        for file_name in os.listdir(output_dir):
+            if file_name.startswith(TEMP_PREFIX):
+                temp_path = os.path.join(output_dir, file_name)
+                if os.path.isdir(temp_path):
+                    shutil.rmtree(temp_path, ignore_errors=True)
+                else:
+                    os.remove(temp_path)
+        manifest = self.read_manifest()
+        if resume:
+            self.checkpoints = self.load_manifest(manifest)[:keep_top_k]
+        tracked = {os.path.basename(entry["path"]) for entry in self.checkpoints}
+        recorded = {os.path.basename(entry["path"]) for entry in manifest.get("checkpoints", [])}
+        untracked = []
+        for file_name in sorted(os.listdir(output_dir)):
+            checkpoint_path = os.path.join(output_dir, file_name)
+            if not file_name.startswith(CHECKPOINT_PREFIX) or file_name in tracked or not os.path.isdir(checkpoint_path):
+                continue
+            # Checkpoints this manager recorded in checkpoints.json, and no longer ranks, would only take up disk
+            if file_name in recorded:
+                shutil.rmtree(checkpoint_path, ignore_errors=True)
+            else:
+                untracked.append(file_name)
+        # Anything else was not written by a manager (or its manifest is gone); it is kept, just moved out of
+        # the way of this run's step names
+        if untracked:
+            untracked_dir = make_untracked_dir(output_dir)
+            for file_name in untracked:
+                os.replace(os.path.join(output_dir, file_name), os.path.join(untracked_dir, file_name))
+        write_json_atomic(os.path.join(output_dir, MANIFEST_FILE), self.get_manifest(self.checkpoints))
+
+    def read_manifest(self):
+        manifest_path = os.path.join(self.output_dir, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            return {}
+        with open(manifest_path, "r", encoding="utf-8") as manifest_file:
+            return json.load(manifest_file)
+
+    def load_manifest(self, manifest):
+        # Checkpoints ranked by another metric or mode aren't comparable with this run's
+        if manifest.get("metric") != self.metric_name or manifest.get("mode") != self.mode:
+            return []
+        checkpoints = [entry for entry in manifest.get("checkpoints", [])
+                       if os.path.isfile(os.path.join(entry["path"], WEIGHTS_FILE))]
+        return sorted(checkpoints, key=lambda entry: entry["metric"], reverse=self.mode == "max")
+
+    def get_manifest(self, checkpoints):
+        return {"metric": self.metric_name, "mode": self.mode, "checkpoints": checkpoints}
+
+    def is_better(self, metric, other_metric):
+        return metric < other_metric if self.mode == "min" else metric > other_metric
+
+    def should_save(self, metric):
+        return len(self.checkpoints) < self.keep_top_k or self.is_better(metric, self.checkpoints[-1]["metric"])
+
+    def wait(self):
+        # Re-raises a failed background write on the training thread
+        if self.pending is not None:
+            seconds, path = self.pending.result()
+            self.pending = None
+            if self.on_write:
+                self.on_write(seconds, path)
+
+    def save(self, model, metric, step):
+        if not self.should_save(metric):
+            return False
+        # At most one write in flight, so at most one extra CPU copy of the weights
+        self.wait()
+        state_dict = {name: tensor.detach().to("cpu", copy=True).contiguous() for name, tensor in model.state_dict().items()}
+        config = model.config.to_dict()
+        checkpoint = {"path": os.path.join(self.output_dir, f"{CHECKPOINT_PREFIX}{step}"), "metric": metric, "step": step}
+        # A resumed checkpoint with the same step name is overwritten, so it leaves the ranking
+        others = [entry for entry in self.checkpoints if entry["path"] != checkpoint["path"]]
+        checkpoints = sorted(others + [checkpoint], key=lambda entry: entry["metric"], reverse=self.mode == "max")
+        self.checkpoints = checkpoints[:self.keep_top_k]
+        removed = [entry["path"] for entry in checkpoints[self.keep_top_k:]]
+        self.pending = self.executor.submit(self.write_checkpoint, state_dict, config, checkpoint, removed, list(self.checkpoints))
+        return True
+
+    def write_checkpoint(self, state_dict, config, checkpoint, removed, checkpoints):
+        started_at = time.perf_counter()
+        temp_dir = os.path.join(self.output_dir, TEMP_PREFIX + os.path.basename(checkpoint["path"]))
+        os.makedirs(temp_dir, exist_ok=True)
+        save_file(state_dict, os.path.join(temp_dir, WEIGHTS_FILE), metadata={"format": "pt"})
+        with open(os.path.join(temp_dir, CONFIG_FILE), "w", encoding="utf-8") as config_file:
+            json.dump(config, config_file, indent=2, sort_keys=True)
+        if os.path.exists(checkpoint["path"]):
+            shutil.rmtree(checkpoint["path"])
+        os.replace(temp_dir, checkpoint["path"])
+        # Older checkpoints are only dropped once the new one is safely in place
+        for path in removed:
+            shutil.rmtree(path, ignore_errors=True)
+        write_json_atomic(os.path.join(self.output_dir, MANIFEST_FILE), self.get_manifest(checkpoints))
+        return time.perf_counter() - started_at, checkpoint["path"]
+
+    def get_best_checkpoint(self):
+        return self.checkpoints[0]["path"] if self.checkpoints else None
+
+    def close(self):
+        # Waits for the last write, then exposes the best checkpoint's files at output_dir itself,
+        # so from_pretrained(output_dir) loads the best model
+        self.wait()
+        self.executor.shutdown()
+        best_checkpoint = self.get_best_checkpoint()
+        if best_checkpoint is None:
+            return None
+        for file_name in (WEIGHTS_FILE, CONFIG_FILE):
+            temp_path = os.path.join(self.output_dir, TEMP_PREFIX + file_name)
+            try:
+                os.link(os.path.join(best_checkpoint, file_name), temp_path)
+            except OSError:
+                shutil.copy2(os.path.join(best_checkpoint, file_name), temp_path)
+            os.replace(temp_path, os.path.join(self.output_dir, file_name))
+        return best_checkpoint
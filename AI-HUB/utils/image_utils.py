@@ -0,0 +1,61 @@
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+from PIL import Image
+
+# Input sizes of the AI-HUB models; images are never decoded much larger than this
+VIT_IMAGE_SIZE = 224
+CLIP_IMAGE_SIZE = 224
+BLIP_IMAGE_SIZE = 384
+
+
+def get_processor_image_size(image_processor):
+    # Largest edge a Hugging Face image processor resizes/crops to, e.g. {"shortest_edge": 224} or {"height": 384, ...}
+    sizes = []
+    for size in (getattr(image_processor, "size", None), getattr(image_processor, "crop_size", None)):
+        if isinstance(size, int):
+            sizes.append(size)
+        elif size is not None:
+            # A plain dict on older transformers, a SizeDict on newer ones
+            sizes.extend(size.get(key) if isinstance(size, dict) else getattr(size, key, None)
+                         for key in ("height", "width", "shortest_edge"))
+    sizes = [size for size in sizes if isinstance(size, int)]
+    return max(sizes) if sizes else None
+
+
+def open_image(source):
+    if isinstance(source, Image.Image):
+        return source
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return Image.open(io.BytesIO(source))
+    if isinstance(source, str) and source.startswith(("http://", "https://")):
+        response = requests.get(source, timeout=60)
+        response.raise_for_status()
+        return Image.open(io.BytesIO(response.content))
+    return Image.open(source)
+
+
+# Decode a path, URL, bytes or file object to a PIL image (or uint8 HWC array). With target_size, JPEGs are
+# decoded with DCT scaling (draft mode) at the smallest 1/2, 1/4 or 1/8 scale that keeps both sides
+# >= target_size, so the model's own resize still sees at least as many pixels as it keeps
+def load_image(source, target_size=None, mode="RGB", as_array=False):
+    image = open_image(source)
+    if target_size and image.format == "JPEG":
+        image.draft(mode, (target_size, target_size))
+    if image.mode != mode:
+        image = image.convert(mode)
+    else:
+        image.load()
+    return np.asarray(image) if as_array else image
+
+
+def load_images(sources, target_size=None, mode="RGB", as_array=False, max_workers=None):
+    # Pillow releases the GIL while decoding, so a thread pool scales across cores
+    sources = list(sources)
+    if len(sources) <= 1:
+        return [load_image(source, target_size, mode, as_array) for source in sources]
+    with ThreadPoolExecutor(max_workers=max_workers or min(len(sources), os.cpu_count() or 1)) as executor:
+        return list(executor.map(lambda source: load_image(source, target_size, mode, as_array), sources))
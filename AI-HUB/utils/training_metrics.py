@@ -0,0 +1,190 @@
+import contextlib
+import csv
+import json
+import os
+import sys
+import time
+
+import torch
+from transformers import TrainerCallback
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Opt-in: nothing is measured or written unless TRAINING_METRICS_LOG is set, e.g.
+#   TRAINING_METRICS_LOG=metrics.jsonl TRAINING_PROFILE_STEPS=20:30 python train.py
+METRICS_LOG_ENV_VAR = "TRAINING_METRICS_LOG"
+PROFILE_STEPS_ENV_VAR = "TRAINING_PROFILE_STEPS"
+PROFILE_DIR_ENV_VAR = "TRAINING_PROFILE_DIR"
+DEFAULT_PROFILE_DIR = "profiler-traces"
+CSV_FIELDS = ["event", "timestamp", "epoch", "step", "samples", "data_wait_seconds", "compute_seconds",
+              "samples_per_second", "loss", "peak_rss_mb", "seconds", "path"]
+
+
+def get_peak_rss_mb():
+    if resource is None:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return peak_rss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def parse_profile_steps(value):
+    if not value:
+        return None
+    start, _, end = value.partition(":")
+    return int(start), int(end)
+
+
+class MetricsWriter:
+    def __init__(self, log_path):
+        os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+        self.log_file = open(log_path, "w", encoding="utf-8", newline="")
+        self.csv_writer = None
+        if log_path.lower().endswith(".csv"):
+            self.csv_writer = csv.DictWriter(self.log_file, fieldnames=CSV_FIELDS, extrasaction="ignore")
+            self.csv_writer.writeheader()
+
+    def write(self, record):
+        if self.csv_writer:
+            self.csv_writer.writerow(record)
+        else:
+            self.log_file.write(json.dumps(record) + "\n")
+        self.log_file.flush()
+
+    def close(self):
+        self.log_file.close()
+
+
+class TrainingMetrics:
+    def __init__(self, log_path=None, profile_steps=None, profile_dir=DEFAULT_PROFILE_DIR):
+        self.enabled = bool(log_path)
+        self.writer = MetricsWriter(log_path) if self.enabled else None
+        self.step = 0
+        self.epoch = 0
+        self.step_started_at = None
+        self.data_wait = 0.0
+        self.profiler = None
+        if self.enabled and profile_steps:
+            # Trace steps [start, end) with one warm-up step before the window
+            start, end = profile_steps
+            self.profiler = torch.profiler.profile(
+                activities=[torch.profiler.ProfilerActivity.CPU]
+                + ([torch.profiler.ProfilerActivity.CUDA] if torch.cuda.is_available() else []),
+                schedule=torch.profiler.schedule(skip_first=max(start - 1, 0), wait=0, warmup=min(start, 1),
+                                                 active=end - start, repeat=1),
+                on_trace_ready=torch.profiler.tensorboard_trace_handler(profile_dir),
+                record_shapes=True,
+                profile_memory=True,
+            )
+            self.profiler.start()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            os.environ.get(METRICS_LOG_ENV_VAR),
+            parse_profile_steps(os.environ.get(PROFILE_STEPS_ENV_VAR)),
+            os.environ.get(PROFILE_DIR_ENV_VAR, DEFAULT_PROFILE_DIR),
+        )
+
+    def write(self, event, **fields):
+        self.writer.write({"event": event, "timestamp": time.time(), "epoch": self.epoch, "step": self.step, **fields})
+
+    # Yields the loader's batches, timing how long the training loop waited for each one
+    def timed_batches(self, batches, epoch=None):
+        if epoch is not None:
+            self.epoch = epoch
+        if not self.enabled:
+            yield from batches
+            return
+        iterator = iter(batches)
+        while True:
+            wait_started_at = time.perf_counter()
+            try:
+                batch = next(iterator)
+            except StopIteration:
+                return
+            self.start_step(time.perf_counter() - wait_started_at)
+            yield batch
+
+    def start_step(self, data_wait):
+        self.data_wait = data_wait
+        self.step_started_at = time.perf_counter()
+
+    def end_step(self, samples, loss=None):
+        if not self.enabled:
+            return
+        if torch.cuda.is_available():
+            # Kernels run asynchronously; without a sync compute time would leak into the next data wait
+            torch.cuda.synchronize()
+        compute = time.perf_counter() - self.step_started_at
+        self.step += 1
+        self.write(
+            "step",
+            samples=samples,
+            data_wait_seconds=self.data_wait,
+            compute_seconds=compute,
+            samples_per_second=samples / (self.data_wait + compute) if self.data_wait + compute else None,
+            loss=loss,
+            peak_rss_mb=get_peak_rss_mb(),
+        )
+        if self.profiler:
+            self.profiler.step()
+
+    def record_checkpoint(self, seconds, path=None):
+        if self.enabled:
+            self.write("checkpoint", seconds=seconds, path=path, peak_rss_mb=get_peak_rss_mb())
+
+    # Time spent writing a checkpoint off the training thread (see CheckpointManager's on_write)
+    def record_checkpoint_write(self, seconds, path=None):
+        if self.enabled:
+            self.write("checkpoint_write", seconds=seconds, path=path)
+
+    @contextlib.contextmanager
+    def time_checkpoint(self, path=None):
+        started_at = time.perf_counter()
+        yield
+        self.record_checkpoint(time.perf_counter() - started_at, path)
+
+    def close(self):
+        if self.profiler:
+            self.profiler.stop()
+            self.profiler = None
+        if self.writer:
+            self.writer.close()
+            self.writer = None
+
+
+# Hugging Face Trainer hook: data wait is the gap between one step's end and the next step's start;
+# checkpoint time is the gap between the last step/evaluation and the save
+class TrainingMetricsCallback(TrainerCallback):
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self.last_mark = None
+
+    def on_train_begin(self, args, state, control, **kwargs):
+        self.last_mark = time.perf_counter()
+
+    def on_step_begin(self, args, state, control, **kwargs):
+        self.metrics.epoch = state.epoch
+        self.metrics.start_step(time.perf_counter() - self.last_mark)
+
+    def on_step_end(self, args, state, control, **kwargs):
+        samples = args.per_device_train_batch_size * args.gradient_accumulation_steps * args.world_size
+        self.metrics.end_step(samples)
+        self.last_mark = time.perf_counter()
+
+    def on_log(self, args, state, control, **kwargs):
+        self.last_mark = time.perf_counter()
+
+    def on_evaluate(self, args, state, control, **kwargs):
+        self.last_mark = time.perf_counter()
+
+    def on_save(self, args, state, control, **kwargs):
+        self.metrics.record_checkpoint(time.perf_counter() - self.last_mark, args.output_dir)
+        self.last_mark = time.perf_counter()
+
+    def on_train_end(self, args, state, control, **kwargs):
+        self.metrics.close()
@@ -0,0 +1,157 @@
+import glob
+import json
+import os
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from Services import tableau_connection_info_extractor
+from Services import tableau_visualizationInfo_extractor
+from Services.tableau_extraction_cache import ExtractionCache, CacheEntry, get_lineage_source
+from Services.tableau_metadata_client import MetadataApiError
+from Services.tableau_exporters import DEFAULT_EXPORT_FORMATS, get_export_file_path
+from Services.tableau_workbook_reader import WORKBOOK_EXTENSION, PACKAGED_WORKBOOK_EXTENSION
+
+# Records which workbook content (and lineage source) each output file was written from
+OUTPUT_MANIFEST_FILE = ".outputs.json"
+CONNECTION_INFO_OUTPUT = "connection info"
+VISUALIZATION_INFO_OUTPUT = "visualization info"
+
+class ExtractionResult:
+    def __init__(self, workbook_file_path: str, output_dir: str, error: str = None, cached: bool = False, entry: CacheEntry = None):
+        self.workbook_file_path = workbook_file_path
+        self.output_dir = output_dir
+        self.error = error
+        self.cached = cached
+        self.entry = entry
+
+    @property
+    def succeeded(self):
+        return self.error is None
+
+def find_workbooks(source: str):
+    if os.path.isdir(source):
+        source = os.path.join(source, "*")
+    workbooks = {}
+    for file_path in sorted(glob.glob(source)):
+        stem, extension = os.path.splitext(file_path)
+        extension = extension.lower()
+        if extension not in (WORKBOOK_EXTENSION, PACKAGED_WORKBOOK_EXTENSION):
+            continue
+        # When both flavours of a workbook sit side by side, keep the .twbx: it is what gets published
+        if stem not in workbooks or extension == PACKAGED_WORKBOOK_EXTENSION:
+            workbooks[stem] = file_path
+    return list(workbooks.values())
+
+def get_output_dir(workbook_file_path: str, output_root: str):
+    workbook_name = tableau_visualizationInfo_extractor.get_workbook_name(workbook_file_path)
+    return os.path.join(output_root, workbook_name)
+
+def process_workbook(workbook_file_path: str, output_root: str, include_viz_info: bool = True, cache_dir: str = None, offline: bool = False,
+                     formats: tuple = DEFAULT_EXPORT_FORMATS, sheet_lineage: dict = None, lineage_error: str = None):
+    output_dir = get_output_dir(workbook_file_path, output_root)
+    connection_info_file_path = os.path.join(output_dir, CONNECTION_INFO_OUTPUT)
+    visualization_info_file_path = os.path.join(output_dir, VISUALIZATION_INFO_OUTPUT)
+    try:
+        os.makedirs(output_dir, exist_ok=True)
+        cache = ExtractionCache(cache_dir) if cache_dir else None
+        lineage_source = get_lineage_source(offline)
+        entry = cache.load(workbook_file_path, lineage_source) if cache else CacheEntry(None, lineage_source)
+        cached = entry.data_source_info is not None and (not include_viz_info or entry.visualization_info is not None)
+        output_manifest = read_output_manifest(output_dir)
+        connection_key = entry.workbook_hash
+        viz_key = f"{entry.workbook_hash}:{lineage_source}" if entry.workbook_hash else None
+        # Cached results are only written out again when their output files are missing or were written
+        # from another version of the workbook
+        if entry.data_source_info is None or not outputs_current(output_manifest, CONNECTION_INFO_OUTPUT, connection_key, connection_info_file_path, formats):
+            if entry.data_source_info is None:
+                entry.data_source_info = tableau_connection_info_extractor.extract_data_source_info(workbook_file_path, streaming=True)
+            tableau_connection_info_extractor.save_connection_info(entry.data_source_info, connection_info_file_path, formats)
+            record_outputs(output_manifest, CONNECTION_INFO_OUTPUT, connection_key, formats)
+        if include_viz_info and (entry.visualization_info is None or not outputs_current(output_manifest, VISUALIZATION_INFO_OUTPUT, viz_key, visualization_info_file_path, formats)):
+            if entry.visualization_info is None:
+                if lineage_error:
+                    raise MetadataApiError(lineage_error)
+                entry.visualization_info = tableau_visualizationInfo_extractor.extract_viz_info(workbook_file_path, offline=offline, sheet_lineage=sheet_lineage)
+            tableau_visualizationInfo_extractor.save_viz_info(entry.visualization_info, visualization_info_file_path, formats)
+            record_outputs(output_manifest, VISUALIZATION_INFO_OUTPUT, viz_key, formats)
+        write_output_manifest(output_dir, output_manifest)
+        if cache and not cached:
+            cache.store(entry)
+    except Exception:
+        return ExtractionResult(workbook_file_path, output_dir, traceback.format_exc())
+    return ExtractionResult(workbook_file_path, output_dir, cached=cached, entry=entry)
+
+def outputs_exist(base_file_path: str, formats: tuple):
+    return all(os.path.exists(get_export_file_path(base_file_path, export_format)) for export_format in formats)
+
+def read_output_manifest(output_dir: str):
+    try:
+        with open(os.path.join(output_dir, OUTPUT_MANIFEST_FILE), "r", encoding="utf-8") as manifest_file:
+            return json.load(manifest_file)
+    except (OSError, ValueError):
+        return {}
+
+def write_output_manifest(output_dir: str, output_manifest: dict):
+    manifest_path = os.path.join(output_dir, OUTPUT_MANIFEST_FILE)
+    with open(manifest_path + ".tmp", "w", encoding="utf-8") as manifest_file:
+        json.dump(output_manifest, manifest_file, indent=4)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+def record_outputs(output_manifest: dict, output_name: str, content_key: str, formats: tuple):
+    # Tracked per format, since a run may only write some formats and leave the others from an older version
+    output_manifest.setdefault(output_name, {}).update((export_format, content_key) for export_format in formats)
+
+def outputs_current(output_manifest: dict, output_name: str, content_key: str, base_file_path: str, formats: tuple):
+    written_from = output_manifest.get(output_name, {})
+    return content_key is not None and all(written_from.get(export_format) == content_key for export_format in formats) \
+        and outputs_exist(base_file_path, formats)
+
+def get_duplicate_output_errors(workbook_file_paths: list, output_root: str):
+    # Outputs are keyed by workbook name, so a second workbook with the same name (e.g. a/Sales.twb and
+    # b/Sales.twbx) would overwrite the first one's results; it is reported as failed instead
+    errors = {}
+    claimed = {}
+    for workbook_file_path in workbook_file_paths:
+        output_dir = get_output_dir(workbook_file_path, output_root)
+        key = os.path.normcase(os.path.abspath(output_dir)).casefold()
+        if key in claimed:
+            errors[workbook_file_path] = f"Skipped: {claimed[key]} already writes its results to {output_dir}\n"
+        else:
+            claimed[key] = workbook_file_path
+    return errors
+
+def needs_server_viz_info(workbook_file_path: str, cache_dir: str = None):
+    if not cache_dir:
+        return True
+    return ExtractionCache(cache_dir).load(workbook_file_path, get_lineage_source(offline=False)).visualization_info is None
+
+def run_bulk_extraction(workbook_file_paths: list, output_root: str, max_workers: int = None, include_viz_info: bool = True, cache_dir: str = None, offline: bool = False,
+                        formats: tuple = DEFAULT_EXPORT_FORMATS):
+    duplicate_errors = get_duplicate_output_errors(workbook_file_paths, output_root)
+    for workbook_file_path, error in duplicate_errors.items():
+        yield ExtractionResult(workbook_file_path, get_output_dir(workbook_file_path, output_root), error)
+    workbook_file_paths = [workbook_file_path for workbook_file_path in workbook_file_paths if workbook_file_path not in duplicate_errors]
+    # Server lineage is fetched once, in this process, for every workbook that isn't cached yet, so the
+    # Metadata API sees one batched, rate-limited client rather than one per worker. Publishing for it
+    # runs serially here, before the workers start
+    sheet_lineage = {}
+    lineage_errors = {}
+    if include_viz_info and not offline:
+        pending = []
+        for workbook_file_path in workbook_file_paths:
+            # A workbook that can't even be hashed is reported in its own result, like any other bad file
+            try:
+                if needs_server_viz_info(workbook_file_path, cache_dir):
+                    pending.append(workbook_file_path)
+            except Exception:
+                lineage_errors[workbook_file_path] = traceback.format_exc()
+        fetched_lineage, fetch_errors = tableau_visualizationInfo_extractor.fetch_sheet_lineage_for_workbooks(pending)
+        sheet_lineage.update(fetched_lineage)
+        lineage_errors.update(fetch_errors)
+    # Each workbook is parsed and written by its own worker process; results are yielded as soon as
+    # a workbook finishes so one bad file never holds up or aborts the rest of the run.
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(process_workbook, workbook_file_path, output_root, include_viz_info, cache_dir, offline, formats,
+                                   sheet_lineage.get(workbook_file_path), lineage_errors.get(workbook_file_path))
+                   for workbook_file_path in workbook_file_paths]
+        for future in as_completed(futures):
+            yield future.result()
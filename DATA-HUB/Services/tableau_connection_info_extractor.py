@@ -1,9 +1,8 @@
-import json
 import re
 import xml.etree.ElementTree as ET
-from openpyxl import Workbook
-from openpyxl.styles import Font
-from openpyxl.styles import Alignment
+from Services.tableau_exporters import MergedRange, DEFAULT_EXPORT_FORMATS, get_export_file_path
+from Services.tableau_exporters import save_rows_to_excel, save_rows_to_csv, save_records_to_json, save_records_to_jsonl
+from Services.tableau_workbook_reader import open_workbook
 
 class DatasourceInfo:
     def __init__(self):
@@ -20,7 +19,9 @@ class TableInfo:
         self.table = table
         self.columns = columns
 
-def extract_data_source_info(file_path: str):
+def extract_data_source_info(file_path: str, streaming: bool = False):
+    if streaming:
+        return stream_data_source_info(file_path)
     datasource_info = DatasourceInfo()
     xml_doc = load_xml_document(file_path)
     data_source = get_data_source_element(xml_doc)
@@ -35,7 +36,8 @@ def extract_data_source_info(file_path: str):
     return datasource_info
 
 def load_xml_document(file_path: str):
-    return ET.parse(file_path)
+    with open_workbook(file_path) as workbook_file:
+        return ET.parse(workbook_file)
 
 def get_data_source_element(xml_doc: ET.ElementTree):
     data_source = xml_doc.find(".//datasource")
@@ -65,49 +67,131 @@ def extract_table_column_mapping(xml_doc: ET.ElementTree):
     columnContainer = xml_doc.find(".//cols")
     columns = columnContainer.findall("./map")
     for col in columns:
-        info = col.get("value")
-        if info:
-            table_name, _, column_name = re.split(r'(\]\.\[)', info)
-            table_name = table_name.strip('[]')
-            column_name = column_name.strip('[]')
-            table_column_mapping.setdefault(table_name, []).append(column_name)
+        add_column_mapping(table_column_mapping, col.get("value"))
     return table_column_mapping
 
+def add_column_mapping(table_column_mapping: dict, info: str):
+    if info:
+        table_name, _, column_name = re.split(r'(\]\.\[)', info)
+        table_name = table_name.strip('[]')
+        column_name = column_name.strip('[]')
+        table_column_mapping.setdefault(table_name, []).append(column_name)
+
 def build_table_info_list(table_column_mapping: dict):
     return [TableInfo(table, ", ".join(columns)).__dict__ for table, columns in table_column_mapping.items()]
 
+# Element paths (from the <workbook> root) the streaming parser cares about
+DATASOURCE_PATH = ("workbook", "datasources", "datasource")
+COLS_PATH = DATASOURCE_PATH + ("connection", "cols")
+NAMED_CONNECTIONS_PATH = DATASOURCE_PATH + ("connection", "named-connections")
+NAMED_CONNECTION_PATH = NAMED_CONNECTIONS_PATH + ("named-connection",)
+
+def stream_data_source_info(file_path: str):
+    datasource_info = DatasourceInfo()
+    datasource_info.connections.extend(iter_connection_info(file_path))
+    return datasource_info
+
+def iter_connection_info(file_path: str):
+    # Single forward pass over the workbook: every top-level datasource, its named
+    # connections and its <cols>/<map> block are collected as they stream past and
+    # each element is detached from its parent once closed, so memory stays flat.
+    # Connections are yielded as soon as their datasource closes.
+    elements = []
+    path = []
+    found_data_source = False
+    named_connections = []
+    connection_info = None
+    table_column_mapping = {}
+    with open_workbook(file_path) as workbook_file:
+        for event, elem in ET.iterparse(workbook_file, events=("start", "end")):
+            if event == "start":
+                elements.append(elem)
+                path.append(elem.tag)
+                continue
+            elements.pop()
+            path.pop()
+            parent_path = tuple(path)
+            if parent_path == COLS_PATH and elem.tag == "map":
+                add_column_mapping(table_column_mapping, elem.get("value"))
+            elif parent_path == NAMED_CONNECTION_PATH and elem.tag == "connection" and connection_info is None:
+                connection_info = elem
+            elif parent_path == NAMED_CONNECTIONS_PATH and elem.tag == "named-connection":
+                named_connections.append((elem, connection_info))
+                connection_info = None
+            elif parent_path == DATASOURCE_PATH[:-1] and elem.tag == "datasource":
+                found_data_source = True
+                all_tables = build_table_info_list(table_column_mapping)
+                for connection, connection_info_element in named_connections:
+                    if connection_info_element is None:
+                        continue
+                    connection_type = get_connection_type(connection_info_element)
+                    connection_string = build_connection_string(connection_type, connection, connection_info_element)
+                    yield ConnectionInfo(connection_type, connection_string, list(all_tables))
+                named_connections = []
+                table_column_mapping = {}
+            if elements:
+                elements[-1].remove(elem)
+    if not found_data_source:
+        raise ValueError("No datasource found in the Tableau file.")
+
+CONNECTION_INFO_HEADERS = ["Data Source(s)", "Connection Info", "Data Table(s)", "Column(s)"]
+
 def save_connection_info_to_json_and_excel(data_source_info: DatasourceInfo, json_file_path: str, excel_file_path: str):
     save_to_json(data_source_info, json_file_path)
     save_to_excel(data_source_info, excel_file_path)
 
+def save_connection_info(data_source_info: DatasourceInfo, base_file_path: str, formats: tuple = DEFAULT_EXPORT_FORMATS):
+    savers = {"json": save_to_json, "xlsx": save_to_excel, "csv": save_to_csv, "jsonl": save_to_jsonl}
+    for export_format in formats:
+        savers[export_format](data_source_info, get_export_file_path(base_file_path, export_format))
+
+def iter_connection_records(connections):
+    for conn in connections:
+        yield vars(conn)
+
+def iter_connection_rows(connections):
+    # The connection type/string only go in the first row of each connection; the rest sit under its merged cell
+    for connection in connections:
+        for index, table in enumerate(connection.tables):
+            if index == 0:
+                yield [connection.connection_type, connection.connection_string, table["table"], table["columns"]]
+            else:
+                yield [None, None, table["table"], table["columns"]]
+
+def get_connection_merged_ranges(connections: list):
+    merged_ranges = []
+    start_row = 2
+    for connection in connections:
+        num_rows = len(connection.tables)
+        if num_rows > 1:
+            merged_ranges.append(MergedRange(start_row, 1, start_row + num_rows - 1, 1))
+            merged_ranges.append(MergedRange(start_row, 2, start_row + num_rows - 1, 2))
+        start_row = start_row + num_rows
+    return merged_ranges
+
+def get_connection_centered_cells(connections: list):
+    # The type/string cells of each connection's first row are centered, whether or not they are merged
+    centered_cells = set()
+    row_index = 2
+    for connection in connections:
+        if connection.tables:
+            centered_cells.update(((row_index, 1), (row_index, 2)))
+        row_index = row_index + len(connection.tables)
+    return centered_cells
+
 def save_to_json(data_source_info: DatasourceInfo, json_file_path: str):
-    with open(json_file_path, 'w') as json_file:
-        json.dump([vars(conn) for conn in data_source_info.connections], json_file, indent=4)
+    save_records_to_json(json_file_path, iter_connection_records(data_source_info.connections))
+
+def save_to_jsonl(data_source_info: DatasourceInfo, jsonl_file_path: str):
+    save_records_to_jsonl(jsonl_file_path, iter_connection_records(data_source_info.connections))
+
+def save_to_csv(data_source_info: DatasourceInfo, csv_file_path: str):
+    rows = ([connection.connection_type, connection.connection_string, table["table"], table["columns"]]
+            for connection in data_source_info.connections for table in connection.tables)
+    save_rows_to_csv(csv_file_path, CONNECTION_INFO_HEADERS, rows)
 
 def save_to_excel(data_source_info: DatasourceInfo, excel_file_path: str):
-    workbook = Workbook()
-    sheet = workbook.active
-    sheet.title = "ConnectionInfo"
-    headers = ["Data Source(s)", "Connection Info", "Data Table(s)", "Column(s)"]
-    sheet.append(headers)
-    for cell in sheet[1]:
-        cell.font = Font(bold=True)
-    num_connections = 0
-    for connection in data_source_info.connections:
-        num_connections = num_connections + 1
-        num_cells_to_merge = 0
-        for table in connection.tables:
-            sheet.append([connection.connection_type, connection.connection_string, table["table"], table["columns"]])
-            num_cells_to_merge = num_cells_to_merge + 1
-        sheet.merge_cells(start_row=num_connections + 1, start_column=1, end_row=num_connections + num_cells_to_merge, end_column=1)
-        sheet.merge_cells(start_row=num_connections + 1, start_column=2, end_row=num_connections + num_cells_to_merge, end_column=2)
-        sheet[num_connections + 1][0].alignment = Alignment(horizontal="center", vertical="center")
-        sheet[num_connections + 1][1].alignment = Alignment(horizontal="center", vertical="center")
-    
-    adjust_column_widths(sheet)
-    workbook.save(excel_file_path)
-
-def adjust_column_widths(sheet):
-    for column_cells in sheet.columns:
-        max_length = max(len(str(cell.value)) if cell.value else 0 for cell in column_cells)
-        sheet.column_dimensions[column_cells[0].column_letter].width = max_length + 2
\ No newline at end of file
+    merged_ranges = get_connection_merged_ranges(data_source_info.connections)
+    centered_cells = get_connection_centered_cells(data_source_info.connections)
+    save_rows_to_excel(excel_file_path, "ConnectionInfo", CONNECTION_INFO_HEADERS,
+                       iter_connection_rows(data_source_info.connections), merged_ranges, centered_cells)
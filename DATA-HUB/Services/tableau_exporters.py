@@ -0,0 +1,107 @@
+import csv
+import json
+import pickle
+import tempfile
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+from openpyxl.styles import Alignment
+from openpyxl.utils import get_column_letter
+
+EXPORT_FORMATS = ("json", "xlsx", "csv", "jsonl")
+DEFAULT_EXPORT_FORMATS = ("json", "xlsx")
+
+class ColumnWidthTracker:
+    def __init__(self, padding: int = 2):
+        self.padding = padding
+        self.max_lengths = []
+
+    def update(self, row: list):
+        for index, value in enumerate(row):
+            length = len(str(value)) if value else 0
+            if index >= len(self.max_lengths):
+                self.max_lengths.append(length)
+            elif length > self.max_lengths[index]:
+                self.max_lengths[index] = length
+
+    def apply(self, sheet):
+        for index, max_length in enumerate(self.max_lengths, start=1):
+            sheet.column_dimensions[get_column_letter(index)].width = max_length + self.padding
+
+class MergedRange:
+    def __init__(self, start_row: int, start_column: int, end_row: int, end_column: int):
+        self.start_row = start_row
+        self.start_column = start_column
+        self.end_row = end_row
+        self.end_column = end_column
+
+    @property
+    def coordinate(self):
+        return f"{get_column_letter(self.start_column)}{self.start_row}:{get_column_letter(self.end_column)}{self.end_row}"
+
+def save_rows_to_excel(excel_file_path: str, sheet_title: str, headers: list, rows, merged_ranges: list = (), centered_cells: set = ()):
+    # Write-only workbooks emit column widths before the first row, so rows are spooled to a temp file
+    # while the widths are tracked, then streamed into the sheet; no full cell grid is ever held in memory.
+    width_tracker = ColumnWidthTracker()
+    width_tracker.update(headers)
+    with tempfile.TemporaryFile() as spool:
+        for row in rows:
+            width_tracker.update(row)
+            pickle.dump(row, spool, protocol=pickle.HIGHEST_PROTOCOL)
+        spool.seek(0)
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet(sheet_title)
+        width_tracker.apply(sheet)
+        # (row, column) cells to center; the top-left cell of every merged range is always centered
+        centered_cells = set(centered_cells)
+        for merged_range in merged_ranges:
+            sheet.merged_cells.add(merged_range.coordinate)
+            centered_cells.add((merged_range.start_row, merged_range.start_column))
+        sheet.append([styled_cell(sheet, header, font=Font(bold=True)) for header in headers])
+        row_index = 1
+        while True:
+            try:
+                row = pickle.load(spool)
+            except EOFError:
+                break
+            row_index = row_index + 1
+            sheet.append([styled_cell(sheet, value, alignment=Alignment(horizontal="center", vertical="center"))
+                          if (row_index, column_index) in centered_cells else value
+                          for column_index, value in enumerate(row, start=1)])
+        workbook.save(excel_file_path)
+
+def styled_cell(sheet, value, font: Font = None, alignment: Alignment = None):
+    cell = WriteOnlyCell(sheet, value=value)
+    if font is not None:
+        cell.font = font
+    if alignment is not None:
+        cell.alignment = alignment
+    return cell
+
+def save_rows_to_csv(csv_file_path: str, headers: list, rows):
+    with open(csv_file_path, "w", encoding="utf-8", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(headers)
+        for row in rows:
+            writer.writerow(row)
+
+def save_records_to_json(json_file_path: str, records, indent: int = 4):
+    # Streams a JSON array byte-for-byte identical to json.dump(list(records), indent=indent)
+    padding = " " * indent
+    with open(json_file_path, "w", encoding="utf-8") as json_file:
+        json_file.write("[")
+        empty = True
+        for record in records:
+            json_file.write("\n" if empty else ",\n")
+            json_file.write(padding + json.dumps(record, indent=indent).replace("\n", "\n" + padding))
+            empty = False
+        json_file.write("]" if empty else "\n]")
+
+def save_records_to_jsonl(jsonl_file_path: str, records):
+    with open(jsonl_file_path, "w", encoding="utf-8") as jsonl_file:
+        for record in records:
+            jsonl_file.write(json.dumps(record))
+            jsonl_file.write("\n")
+
+def get_export_file_path(base_file_path: str, export_format: str):
+    return f"{base_file_path}.{export_format}"
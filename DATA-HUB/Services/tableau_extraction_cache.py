@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from Services.tableau_connection_info_extractor import DatasourceInfo, ConnectionInfo
+from Services.tableau_visualizationInfo_extractor import VisualizationInfo
+from Services.tableau_workbook_reader import open_workbook
+
+# Bump whenever the extractors change what they produce; entries written by other versions are never read
+EXTRACTOR_VERSION = "2"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def get_workbook_hash(workbook_file_path: str):
+    # Hashes the workbook XML itself (the embedded .twb for a .twbx), so re-packaged extracts alone
+    # don't invalidate an entry and the bundled data files are never read.
+    digest = hashlib.sha256()
+    with open_workbook(workbook_file_path) as workbook_file:
+        for chunk in iter(lambda: workbook_file.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def data_source_info_to_list(data_source_info: DatasourceInfo):
+    return [vars(conn) for conn in data_source_info.connections]
+
+def data_source_info_from_list(connections: list):
+    data_source_info = DatasourceInfo()
+    for conn in connections:
+        data_source_info.connections.append(ConnectionInfo(conn["connection_type"], conn["connection_string"], conn["tables"]))
+    return data_source_info
+
+def viz_info_to_list(visualization_info_list: list):
+    return [vars(info) for info in visualization_info_list]
+
+def viz_info_from_list(visualizations: list):
+    return [VisualizationInfo(info["worksheet_name"], info["viz_title"], info["viz_type"], info["tables_used"], info["column_used"])
+            for info in visualizations]
+
+def get_lineage_source(offline: bool):
+    return "offline" if offline else "server"
+
+class CacheEntry:
+    def __init__(self, workbook_hash: str, lineage_source: str = "server", data_source_info: DatasourceInfo = None, visualization_info: list = None):
+        self.workbook_hash = workbook_hash
+        self.lineage_source = lineage_source
+        self.data_source_info = data_source_info
+        self.visualization_info = visualization_info
+
+class ExtractionCache:
+    def __init__(self, cache_dir: str, extractor_version: str = EXTRACTOR_VERSION):
+        self.cache_dir = cache_dir
+        self.extractor_version = extractor_version
+
+    def get_entry_path(self, workbook_hash: str):
+        return os.path.join(self.cache_dir, f"v{self.extractor_version}", workbook_hash[:2], f"{workbook_hash}.json")
+
+    def read_entry_file(self, entry_path: str):
+        if not os.path.exists(entry_path):
+            return {}
+        try:
+            with open(entry_path, "r", encoding="utf-8") as entry_file:
+                return json.load(entry_file)
+        except (OSError, ValueError):
+            # A corrupt entry is treated as a miss and overwritten by the next store
+            return {}
+
+    def load(self, workbook_file_path: str, lineage_source: str = "server"):
+        workbook_hash = get_workbook_hash(workbook_file_path)
+        entry = CacheEntry(workbook_hash, lineage_source)
+        cached = self.read_entry_file(self.get_entry_path(workbook_hash))
+        if cached.get("connections") is not None:
+            entry.data_source_info = data_source_info_from_list(cached["connections"])
+        # Offline and server lineage are cached side by side so either can be cross-checked against the other
+        visualizations = cached.get("visualizations", {}).get(lineage_source)
+        if visualizations is not None:
+            entry.visualization_info = viz_info_from_list(visualizations)
+        return entry
+
+    def store(self, entry: CacheEntry):
+        entry_path = self.get_entry_path(entry.workbook_hash)
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        visualizations = self.read_entry_file(entry_path).get("visualizations", {})
+        if entry.visualization_info is not None:
+            visualizations[entry.lineage_source] = viz_info_to_list(entry.visualization_info)
+        cached = {
+            "extractor_version": self.extractor_version,
+            "connections": data_source_info_to_list(entry.data_source_info) if entry.data_source_info else None,
+            "visualizations": visualizations
+        }
+        # Write-then-rename so concurrent workers never observe a half-written entry
+        file_descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(entry_path), suffix=".tmp")
+        try:
+            with os.fdopen(file_descriptor, "w", encoding="utf-8") as entry_file:
+                json.dump(cached, entry_file)
+            os.replace(temp_path, entry_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def invalidate(self, workbook_file_path: str):
+        entry_path = self.get_entry_path(get_workbook_hash(workbook_file_path))
+        if os.path.exists(entry_path):
+            os.remove(entry_path)
+            return True
+        return False
+
+    def clear(self):
+        if os.path.isdir(self.cache_dir):
+            shutil.rmtree(self.cache_dir)
@@ -0,0 +1,87 @@
+import re
+import xml.etree.ElementTree as ET
+
+FIELD_REFERENCE_PATTERN = re.compile(r"\[([^\[\]]+)\]")
+
+class DatasourceLineage:
+    def __init__(self):
+        # '[Local Field]' -> (table, physical column)
+        self.physical_columns = {}
+        # '[Calculated Field]' -> formula
+        self.calculations = {}
+
+def split_qualified_name(value: str):
+    table_name, _, column_name = re.split(r'(\]\.\[)', value)
+    return table_name.strip('[]'), column_name.strip('[]')
+
+def get_calculation_formula(column: ET.Element):
+    calculation = column.find("./calculation")
+    if calculation is None:
+        return None
+    return calculation.get("formula")
+
+def build_datasource_lineage(xml_doc: ET.ElementTree):
+    datasource_lineage = {}
+    for datasource in xml_doc.findall("./datasources/datasource"):
+        lineage = DatasourceLineage()
+        for record in datasource.findall("./connection/metadata-records/metadata-record[@class='column']"):
+            local_name = record.findtext("local-name")
+            parent_name = record.findtext("parent-name")
+            remote_name = record.findtext("remote-name")
+            if local_name and parent_name and remote_name:
+                lineage.physical_columns[local_name] = (parent_name.strip('[]'), remote_name)
+        # The <cols> map is authoritative for federated sources, so it overrides the metadata records
+        for col in datasource.findall("./connection/cols/map"):
+            key = col.get("key")
+            value = col.get("value")
+            if key and value:
+                lineage.physical_columns[key] = split_qualified_name(value)
+        for column in datasource.findall("./column"):
+            formula = get_calculation_formula(column)
+            if formula:
+                lineage.calculations[column.get("name")] = formula
+        datasource_lineage[datasource.get("name")] = lineage
+    return datasource_lineage
+
+def resolve_physical_columns(field_name: str, lineage: DatasourceLineage, calculations: dict, resolved: list, seen: set):
+    if field_name in seen:
+        return
+    seen.add(field_name)
+    if field_name in lineage.physical_columns:
+        table_column = lineage.physical_columns[field_name]
+        if table_column not in resolved:
+            resolved.append(table_column)
+        return
+    formula = calculations.get(field_name)
+    if formula:
+        # Calculated fields are followed through their formula until they bottom out in physical columns
+        for reference in FIELD_REFERENCE_PATTERN.findall(formula):
+            resolve_physical_columns(f"[{reference}]", lineage, calculations, resolved, seen)
+
+def get_worksheet_lineage(datasource_dependencies: list, datasource_lineage: dict):
+    resolved = []
+    for dependencies in datasource_dependencies:
+        lineage = datasource_lineage.get(dependencies.get("datasource"))
+        if lineage is None:
+            continue
+        calculations = dict(lineage.calculations)
+        columns = dependencies.findall("./column")
+        for column in columns:
+            formula = get_calculation_formula(column)
+            if formula:
+                calculations[column.get("name")] = formula
+        seen = set()
+        for column in columns:
+            resolve_physical_columns(column.get("name"), lineage, calculations, resolved, seen)
+    return resolved
+
+def get_tables_and_columns(datasource_dependencies: list, datasource_lineage: dict):
+    # Same shape as the Metadata API lookup: comma separated upstream tables and upstream columns
+    resolved = get_worksheet_lineage(datasource_dependencies, datasource_lineage)
+    tables = []
+    for table, _ in resolved:
+        if table not in tables:
+            tables.append(table)
+    tablesUsed = ", ".join(tables)
+    columnsUsed = ", ".join(column for _, column in resolved)
+    return (tablesUsed, columnsUsed)
@@ -0,0 +1,217 @@
+import os
+import sqlite3
+from datetime import datetime
+from Services.tableau_connection_info_extractor import DatasourceInfo
+
+SCHEMA = """
+PRAGMA foreign_keys = ON;
+CREATE TABLE IF NOT EXISTS workbooks (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL COLLATE NOCASE,
+    content_hash TEXT,
+    lineage_source TEXT,
+    loaded_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS connections (
+    id INTEGER PRIMARY KEY,
+    workbook_id INTEGER NOT NULL REFERENCES workbooks(id) ON DELETE CASCADE,
+    connection_type TEXT NOT NULL COLLATE NOCASE,
+    connection_string TEXT NOT NULL COLLATE NOCASE
+);
+CREATE TABLE IF NOT EXISTS data_tables (
+    id INTEGER PRIMARY KEY,
+    workbook_id INTEGER NOT NULL REFERENCES workbooks(id) ON DELETE CASCADE,
+    connection_id INTEGER NOT NULL REFERENCES connections(id) ON DELETE CASCADE,
+    table_name TEXT NOT NULL COLLATE NOCASE
+);
+CREATE TABLE IF NOT EXISTS data_columns (
+    id INTEGER PRIMARY KEY,
+    workbook_id INTEGER NOT NULL REFERENCES workbooks(id) ON DELETE CASCADE,
+    table_id INTEGER NOT NULL REFERENCES data_tables(id) ON DELETE CASCADE,
+    table_name TEXT NOT NULL COLLATE NOCASE,
+    column_name TEXT NOT NULL COLLATE NOCASE
+);
+CREATE TABLE IF NOT EXISTS worksheets (
+    id INTEGER PRIMARY KEY,
+    workbook_id INTEGER NOT NULL REFERENCES workbooks(id) ON DELETE CASCADE,
+    name TEXT NOT NULL COLLATE NOCASE,
+    viz_title TEXT,
+    viz_type TEXT
+);
+CREATE TABLE IF NOT EXISTS worksheet_columns (
+    worksheet_id INTEGER NOT NULL REFERENCES worksheets(id) ON DELETE CASCADE,
+    workbook_id INTEGER NOT NULL REFERENCES workbooks(id) ON DELETE CASCADE,
+    table_name TEXT COLLATE NOCASE,
+    column_name TEXT NOT NULL COLLATE NOCASE
+);
+CREATE INDEX IF NOT EXISTS idx_workbooks_name ON workbooks(name);
+CREATE INDEX IF NOT EXISTS idx_connections_workbook ON connections(workbook_id);
+CREATE INDEX IF NOT EXISTS idx_connections_string ON connections(connection_string);
+CREATE INDEX IF NOT EXISTS idx_connections_type ON connections(connection_type);
+CREATE INDEX IF NOT EXISTS idx_data_tables_workbook ON data_tables(workbook_id);
+CREATE INDEX IF NOT EXISTS idx_data_tables_connection ON data_tables(connection_id);
+CREATE INDEX IF NOT EXISTS idx_data_tables_name ON data_tables(table_name);
+CREATE INDEX IF NOT EXISTS idx_data_columns_workbook ON data_columns(workbook_id);
+CREATE INDEX IF NOT EXISTS idx_data_columns_table ON data_columns(table_id);
+CREATE INDEX IF NOT EXISTS idx_data_columns_name ON data_columns(column_name, table_name);
+CREATE INDEX IF NOT EXISTS idx_worksheets_workbook ON worksheets(workbook_id);
+CREATE INDEX IF NOT EXISTS idx_worksheet_columns_worksheet ON worksheet_columns(worksheet_id);
+CREATE INDEX IF NOT EXISTS idx_worksheet_columns_workbook ON worksheet_columns(workbook_id);
+CREATE INDEX IF NOT EXISTS idx_worksheet_columns_name ON worksheet_columns(column_name, table_name);
+CREATE INDEX IF NOT EXISTS idx_worksheet_columns_table ON worksheet_columns(table_name);
+"""
+
+def split_names(value: str):
+    if not value:
+        return []
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+def resolve_worksheet_columns(tables_used: str, columns_used: str, table_columns: dict):
+    # Visualization records only carry comma separated table and column names, so each column is
+    # attributed to the sheet's upstream tables that actually contain it (or left unattributed).
+    tables = split_names(tables_used)
+    resolved = []
+    for column_name in dict.fromkeys(split_names(columns_used)):
+        owners = [table for table in tables if column_name in table_columns.get(table, ())]
+        if not owners and len(tables) == 1:
+            owners = tables
+        for table in owners or [None]:
+            resolved.append((table, column_name))
+    return resolved
+
+class MetadataCatalog:
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(db_path)
+        self.connection.executescript(SCHEMA)
+        # Catalogs created before worksheet rows recorded their lineage source
+        workbook_columns = {row[1] for row in self.connection.execute("PRAGMA table_info(workbooks)")}
+        if "lineage_source" not in workbook_columns:
+            self.connection.execute("ALTER TABLE workbooks ADD COLUMN lineage_source TEXT")
+        self.connection.execute("PRAGMA journal_mode = WAL")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def is_current(self, workbook_file_path: str, content_hash: str, lineage_source: str = None):
+        # lineage_source: the worksheets must also have been loaded, from that lineage source ("offline"/"server")
+        row = self.connection.execute("SELECT content_hash, lineage_source FROM workbooks WHERE path = ?",
+                                      (os.path.abspath(workbook_file_path),)).fetchone()
+        if row is None or content_hash is None or row[0] != content_hash:
+            return False
+        return lineage_source is None or row[1] == lineage_source
+
+    def upsert_workbook(self, workbook_file_path: str, workbook_name: str, data_source_info: DatasourceInfo = None,
+                        visualization_info: list = None, content_hash: str = None, lineage_source: str = None):
+        # Replaces everything known about one workbook in a single transaction; other workbooks are untouched
+        path = os.path.abspath(workbook_file_path)
+        with self.connection:
+            cursor = self.connection.cursor()
+            existing = cursor.execute("SELECT content_hash, lineage_source FROM workbooks WHERE path = ?", (path,)).fetchone()
+            stale_worksheets = False
+            if visualization_info is None:
+                # Worksheet rows from an earlier load are only kept while they still describe this content
+                stale_worksheets = existing is not None and existing[0] != content_hash
+                lineage_source = None if existing is None or stale_worksheets else existing[1]
+            cursor.execute("""
+                INSERT INTO workbooks (path, name, content_hash, lineage_source, loaded_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(path) DO UPDATE SET name = excluded.name, content_hash = excluded.content_hash,
+                    lineage_source = excluded.lineage_source, loaded_at = excluded.loaded_at
+            """, (path, workbook_name, content_hash, lineage_source, datetime.now().isoformat(timespec="seconds")))
+            workbook_id = cursor.execute("SELECT id FROM workbooks WHERE path = ?", (path,)).fetchone()[0]
+            table_columns = {}
+            if data_source_info is not None:
+                cursor.execute("DELETE FROM connections WHERE workbook_id = ?", (workbook_id,))
+                for conn in data_source_info.connections:
+                    cursor.execute("INSERT INTO connections (workbook_id, connection_type, connection_string) VALUES (?, ?, ?)",
+                                   (workbook_id, conn.connection_type, conn.connection_string))
+                    connection_id = cursor.lastrowid
+                    for table in conn.tables:
+                        cursor.execute("INSERT INTO data_tables (workbook_id, connection_id, table_name) VALUES (?, ?, ?)",
+                                       (workbook_id, connection_id, table["table"]))
+                        table_id = cursor.lastrowid
+                        column_names = split_names(table["columns"])
+                        table_columns.setdefault(table["table"], set()).update(column_names)
+                        cursor.executemany("INSERT INTO data_columns (workbook_id, table_id, table_name, column_name) VALUES (?, ?, ?, ?)",
+                                           [(workbook_id, table_id, table["table"], column_name) for column_name in column_names])
+            else:
+                for table_name, column_name in cursor.execute("SELECT table_name, column_name FROM data_columns WHERE workbook_id = ?", (workbook_id,)).fetchall():
+                    table_columns.setdefault(table_name, set()).add(column_name)
+            if visualization_info is not None or stale_worksheets:
+                cursor.execute("DELETE FROM worksheets WHERE workbook_id = ?", (workbook_id,))
+            if visualization_info is not None:
+                for info in visualization_info:
+                    worksheet_columns = []
+                    if info.viz_type != "No Visualization":
+                        worksheet_columns = resolve_worksheet_columns(info.tables_used, info.column_used, table_columns)
+                    cursor.execute("INSERT INTO worksheets (workbook_id, name, viz_title, viz_type) VALUES (?, ?, ?, ?)",
+                                   (workbook_id, info.worksheet_name, info.viz_title, info.viz_type))
+                    worksheet_id = cursor.lastrowid
+                    cursor.executemany("INSERT INTO worksheet_columns (worksheet_id, workbook_id, table_name, column_name) VALUES (?, ?, ?, ?)",
+                                       [(worksheet_id, workbook_id, table_name, column_name)
+                                        for table_name, column_name in worksheet_columns])
+        return workbook_id
+
+    def remove_workbook(self, workbook_file_path: str):
+        with self.connection:
+            self.connection.execute("DELETE FROM workbooks WHERE path = ?", (os.path.abspath(workbook_file_path),))
+
+    def list_workbooks(self):
+        return self.connection.execute("SELECT name, path, content_hash, lineage_source, loaded_at FROM workbooks ORDER BY name").fetchall()
+
+    def find_column_usage(self, column_name: str, table_name: str = None):
+        # Worksheets that use the column, plus workbooks whose datasources expose it without a sheet using it
+        query = """
+            SELECT w.name, w.path, s.name, wc.table_name, wc.column_name
+            FROM worksheet_columns wc
+            JOIN worksheets s ON s.id = wc.worksheet_id
+            JOIN workbooks w ON w.id = wc.workbook_id
+            WHERE wc.column_name = ? {table_filter}
+            UNION
+            SELECT w.name, w.path, NULL, dc.table_name, dc.column_name
+            FROM data_columns dc
+            JOIN workbooks w ON w.id = dc.workbook_id
+            WHERE dc.column_name = ? {data_table_filter}
+            ORDER BY 1, 3
+        """
+        if table_name is None:
+            return self.connection.execute(query.format(table_filter="", data_table_filter=""), (column_name, column_name)).fetchall()
+        return self.connection.execute(query.format(table_filter="AND wc.table_name = ?", data_table_filter="AND dc.table_name = ?"),
+                                       (column_name, table_name, column_name, table_name)).fetchall()
+
+    def find_table_usage(self, table_name: str):
+        return self.connection.execute("""
+            SELECT DISTINCT w.name, w.path, s.name
+            FROM worksheet_columns wc
+            JOIN worksheets s ON s.id = wc.worksheet_id
+            JOIN workbooks w ON w.id = wc.workbook_id
+            WHERE wc.table_name = ?
+            UNION
+            SELECT DISTINCT w.name, w.path, NULL
+            FROM data_tables dt
+            JOIN workbooks w ON w.id = dt.workbook_id
+            WHERE dt.table_name = ?
+            ORDER BY 1, 3
+        """, (table_name, table_name)).fetchall()
+
+    def find_datasource_usage(self, connection_string: str):
+        # Prefix match, so a server or file path finds every database/sheet behind it
+        return self.connection.execute("""
+            SELECT DISTINCT w.name, w.path, c.connection_type, c.connection_string
+            FROM connections c
+            JOIN workbooks w ON w.id = c.workbook_id
+            WHERE c.connection_string = ? OR c.connection_string LIKE ? ESCAPE '\\' OR c.connection_type = ?
+            ORDER BY 1
+        """, (connection_string, escape_like(connection_string) + "%", connection_string)).fetchall()
+
+def escape_like(value: str):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
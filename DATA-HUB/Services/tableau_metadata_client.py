@@ -0,0 +1,140 @@
+import asyncio
+import json
+import random
+import time
+import aiohttp
+from tableau_api_lib import TableauServerConnection
+
+METADATA_API_PATH = "/api/metadata/graphql"
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+class MetadataApiError(Exception):
+    pass
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: int = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+def quote_graphql_string(value: str):
+    return json.dumps(value)
+
+def build_sheet_lineage_query(workbook_names: list):
+    # One aliased field per workbook, so a single request returns the lineage of every sheet in every workbook
+    fields = []
+    for index, workbook_name in enumerate(workbook_names):
+        fields.append(f"""
+        wb{index}: workbooks (filter: {{ name: {quote_graphql_string(workbook_name)} }}) {{
+            sheets {{
+                name
+                upstreamTables {{
+                    name
+                }}
+                upstreamColumns {{
+                    name
+                }}
+            }}
+        }}""")
+    return "{" + "".join(fields) + "\n}"
+
+def format_sheet_lineage(sheet: dict):
+    tablesUsed = ", ".join(table["name"] for table in sheet.get("upstreamTables") or [])
+    columnsUsed = ", ".join(column["name"] for column in sheet.get("upstreamColumns") or [])
+    return (tablesUsed, columnsUsed)
+
+class MetadataApiClient:
+    def __init__(self, server: str, auth_token: str, workbooks_per_request: int = 25, max_concurrency: int = 4,
+                 requests_per_second: float = 2.0, max_retries: int = 5, backoff_seconds: float = 1.0,
+                 index_retries: int = 6, ssl_verify: bool = True):
+        self.endpoint = server.rstrip("/") + METADATA_API_PATH
+        self.auth_token = auth_token
+        self.workbooks_per_request = workbooks_per_request
+        self.max_concurrency = max_concurrency
+        self.requests_per_second = requests_per_second
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.index_retries = index_retries
+        self.ssl_verify = ssl_verify
+
+    @classmethod
+    def from_connection(cls, connection: TableauServerConnection, **kwargs):
+        return cls(connection.server, connection.auth_token, ssl_verify=connection.ssl_verify, **kwargs)
+
+    def get_backoff(self, attempt: int, retry_after: str = None):
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return self.backoff_seconds * (2 ** attempt) * (1 + random.random())
+
+    async def post_query(self, session: aiohttp.ClientSession, rate_limiter: TokenBucket, query: str):
+        headers = {"X-Tableau-Auth": self.auth_token, "Content-Type": "application/json", "Accept": "application/json"}
+        for attempt in range(self.max_retries + 1):
+            await rate_limiter.acquire()
+            async with session.post(self.endpoint, json={"query": query}, headers=headers, ssl=self.ssl_verify) as response:
+                # Only back off when the server actually pushes back
+                if response.status in RETRY_STATUS_CODES and attempt < self.max_retries:
+                    await asyncio.sleep(self.get_backoff(attempt, response.headers.get("Retry-After")))
+                    continue
+                if response.status != 200:
+                    raise MetadataApiError(f"Metadata API request failed with status {response.status}: {await response.text()}")
+                response_json = await response.json(content_type=None)
+            if response_json.get("errors") and not response_json.get("data"):
+                raise MetadataApiError(f"Metadata API query failed: {response_json['errors']}")
+            return response_json["data"]
+        raise MetadataApiError("Metadata API request retries exhausted")
+
+    async def fetch_batch(self, session: aiohttp.ClientSession, rate_limiter: TokenBucket, workbook_names: list):
+        lineage = {}
+        pending = list(workbook_names)
+        for attempt in range(self.index_retries + 1):
+            data = await self.post_query(session, rate_limiter, build_sheet_lineage_query(pending))
+            not_indexed = []
+            for index, workbook_name in enumerate(pending):
+                workbooks = data.get(f"wb{index}") or []
+                if not workbooks:
+                    not_indexed.append(workbook_name)
+                    continue
+                lineage[workbook_name] = {sheet["name"]: format_sheet_lineage(sheet) for sheet in workbooks[0]["sheets"]}
+            pending = not_indexed
+            if not pending or attempt == self.index_retries:
+                break
+            # Freshly published workbooks take a moment to appear in the Metadata API index
+            await asyncio.sleep(self.get_backoff(attempt))
+        for workbook_name in pending:
+            lineage[workbook_name] = {}
+        return lineage
+
+    async def fetch_sheet_lineage_async(self, workbook_names: list):
+        rate_limiter = TokenBucket(self.requests_per_second, capacity=self.max_concurrency)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        batches = [workbook_names[i:i + self.workbooks_per_request] for i in range(0, len(workbook_names), self.workbooks_per_request)]
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            async def fetch(batch):
+                async with semaphore:
+                    return await self.fetch_batch(session, rate_limiter, batch)
+            results = await asyncio.gather(*(fetch(batch) for batch in batches))
+        lineage = {}
+        for result in results:
+            lineage.update(result)
+        return lineage
+
+    def fetch_sheet_lineage(self, workbook_names: list):
+        # {workbook name: {sheet name: (tables used, columns used)}}
+        return asyncio.run(self.fetch_sheet_lineage_async(list(dict.fromkeys(workbook_names))))
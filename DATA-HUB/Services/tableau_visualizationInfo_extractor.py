@@ -1,12 +1,11 @@
-import json
-from openpyxl.worksheet.worksheet import Worksheet
-from openpyxl.styles import Font
 from tableau_api_lib import TableauServerConnection
-from collections import namedtuple
-from openpyxl import Workbook
 import xml.etree.ElementTree as ET
+from Services.tableau_exporters import DEFAULT_EXPORT_FORMATS, get_export_file_path
+from Services.tableau_exporters import save_rows_to_excel, save_rows_to_csv, save_records_to_json, save_records_to_jsonl
+from Services.tableau_workbook_reader import open_workbook
+from Services import tableau_lineage_extractor
+from Services.tableau_metadata_client import MetadataApiClient
 import os
-import time
 
 class VisualizationInfo:
     def __init__(self, worksheet_name: str, viz_title: str, viz_type: str, tables_used: str, columns_used: str):
@@ -21,73 +20,84 @@ def get_workbook_name(file_path: str):
     workbook_name, _ = os.path.splitext(file_name)
     return workbook_name
 
-def get_viz_title(worksheet: ET.Element):
-    title = worksheet.find(".//run")
-    if title is None:
+class WorksheetIndexEntry:
+    def __init__(self, name: str, element: ET.Element):
+        self.name = name
+        self.element = element
+        self.title_runs = []
+        self.mark_classes = []
+        self.datasources = []
+        self.datasource_dependencies = []
+        self.panes = []
+        self.dashboards = []
+
+def build_worksheet_index(xml_doc: ET.ElementTree):
+    # One depth-first walk over the whole workbook collects everything the per-sheet queries need,
+    # in document order, instead of several descendant searches per worksheet.
+    worksheet_index = {}
+    dashboard_zones = []
+    stack = [(xml_doc.getroot(), None, None)]
+    while stack:
+        element, entry, dashboard_name = stack.pop()
+        tag = element.tag
+        if tag == "worksheet":
+            entry = WorksheetIndexEntry(element.get("name"), element)
+            worksheet_index[entry.name] = entry
+        elif tag == "dashboard":
+            dashboard_name = element.get("name")
+        elif entry is not None:
+            if tag == "run":
+                entry.title_runs.append(element.text)
+            elif tag == "mark":
+                entry.mark_classes.append(element.get("class"))
+            elif tag == "datasource":
+                entry.datasources.append(element.get("name"))
+            elif tag == "datasource-dependencies":
+                entry.datasource_dependencies.append(element)
+            elif tag == "pane":
+                entry.panes.append(element)
+        elif dashboard_name is not None and tag == "zone" and element.get("name"):
+            dashboard_zones.append((dashboard_name, element.get("name")))
+        stack.extend((child, entry, dashboard_name) for child in reversed(element))
+    for dashboard_name, sheet_name in dashboard_zones:
+        entry = worksheet_index.get(sheet_name)
+        if entry is not None and dashboard_name not in entry.dashboards:
+            entry.dashboards.append(dashboard_name)
+    return worksheet_index
+
+def get_viz_title(worksheet: WorksheetIndexEntry):
+    if not worksheet.title_runs:
         return "No Title"
-    return title.text
+    return worksheet.title_runs[0]
 
-def get_viz_type(worksheet: ET.Element):
-    vizExists = worksheet.find(".//datasource")
-    if vizExists is None:
+def get_viz_type(worksheet: WorksheetIndexEntry):
+    if not worksheet.datasources or not worksheet.mark_classes:
         return "No Visualization"
-    return worksheet.find(".//mark").get("class")
-
-def get_tables_and_columns(workbook_name: str, worksheet_name: str, connection: TableauServerConnection):
-    query = f"""
-    {{
-        workbooks (filter: {{ name: "{workbook_name}"}}) {{
-            sheets (filter: {{ name: "{worksheet_name}"}}) {{
-                upstreamTables {{
-                    name
-                }}
-                upstreamColumns {{
-                    name
-                }}
-            }}
-        }}
-    }}
-    """
-    time.sleep(10)
-    response = connection.metadata_graphql_query(query=query)
-    response_json = response.json()
-
-    tables_as_json = response_json["data"]["workbooks"][0]["sheets"][0]["upstreamTables"]
-    columns_as_json = response_json["data"]["workbooks"][0]["sheets"][0]["upstreamColumns"]
-    tablesUsed  = ", ".join(list(dict.values())[0] for dict in tables_as_json)
-    columnsUsed = ", ".join(list(dict.values())[0] for dict in columns_as_json)
-    return (tablesUsed, columnsUsed)
+    return worksheet.mark_classes[0]
+
+VISUALIZATION_INFO_HEADERS = ["Worksheet Name", "Visualization Title", "Visualization Type", "Tables Used", "Columns Used"]
+
+def iter_viz_rows(visualization_info_list):
+    for vis_info in visualization_info_list:
+        yield [vis_info.worksheet_name, vis_info.viz_title, vis_info.viz_type, vis_info.tables_used, vis_info.column_used]
+
+def iter_viz_records(visualization_info_list):
+    for info in visualization_info_list:
+        yield vars(info)
 
 def save_to_excel(visualization_info_list: list, excel_file_path: str):
-    workbook = Workbook()
-    worksheet = workbook.active
-    worksheet.title = "VisualizationInfo"
-    add_excel_headers(worksheet)
-    populate_excel_data(worksheet, visualization_info_list)
-    for column_cells in worksheet.columns:
-        max_length = max(len(str(cell.value)) if cell.value else 0 for cell in column_cells)
-        worksheet.column_dimensions[column_cells[0].column_letter].width = max_length + 2
-    workbook.save(excel_file_path)
-
-def add_excel_headers(worksheet: Worksheet):
-    headers = ["Worksheet Name", "Visualization Title", "Visualization Type", "Tables Used", "Columns Used"]
-    worksheet.append(headers)
-    for cell in worksheet[1]:
-        cell.font = Font(bold=True)
-
-def populate_excel_data(worksheet: Worksheet, visualization_info_list: list):
-    for i, vis_info in enumerate(visualization_info_list, start=2):
-        worksheet.cell(row=i, column=1, value=vis_info.WorksheetName)
-        worksheet.cell(row=i, column=2, value=vis_info.VisualizationTitle)
-        worksheet.cell(row=i, column=3, value=vis_info.VisualizationType)
-        worksheet.cell(row=i, column=4, value=vis_info.TablesUsed)
-        worksheet.cell(row=i, column=5, value=vis_info.ColumnsUsed)
+    save_rows_to_excel(excel_file_path, "VisualizationInfo", VISUALIZATION_INFO_HEADERS, iter_viz_rows(visualization_info_list))
+
+def save_to_csv(visualization_info_list: list, csv_file_path: str):
+    save_rows_to_csv(csv_file_path, VISUALIZATION_INFO_HEADERS, iter_viz_rows(visualization_info_list))
 
 def save_to_json(visualization_info_list: list, json_file_path: str):
-    with open(json_file_path, "w", encoding="utf-8") as json_file:
-        json.dump([info._asdict() for info in visualization_info_list], json_file, indent=4)
+    save_records_to_json(json_file_path, iter_viz_records(visualization_info_list))
+
+def save_to_jsonl(visualization_info_list: list, jsonl_file_path: str):
+    save_records_to_jsonl(jsonl_file_path, iter_viz_records(visualization_info_list))
 
-def extract_viz_info(workbook_file_path: str, packaged_workbook_file_path: str):
+def get_metadata_connection():
     config = {
     "tableau_prod": {
         "server": "https://10ay.online.tableau.com",
@@ -100,18 +110,83 @@ def extract_viz_info(workbook_file_path: str, packaged_workbook_file_path: str):
     }
     conn = TableauServerConnection(config_json=config, env="tableau_prod")
     conn.sign_in()
-    project_name = "Demo"
-    project_description = "This project contains workbooks for metadata extraction."
-    project_info = conn.create_project(project_name=project_name, project_description=project_description)
+    return conn
+
+METADATA_PROJECT_NAME = "Demo"
+METADATA_PROJECT_DESCRIPTION = "This project contains workbooks for metadata extraction."
+
+def get_metadata_project_id(conn: TableauServerConnection):
+    # Looked up once per sign-in and created only when missing; create_project fails once the project exists
+    response = conn.query_projects(parameter_dict={"filter": f"filter=name:eq:{METADATA_PROJECT_NAME}"})
+    projects = (response.json().get("projects") or {}).get("project") or []
+    if projects:
+        return projects[0]["id"]
+    project_info = conn.create_project(project_name=METADATA_PROJECT_NAME, project_description=METADATA_PROJECT_DESCRIPTION)
     project_info_json = project_info.json()
-    project_id = project_info_json["project"]["id"]
-    workbook_name = get_workbook_name(packaged_workbook_file_path)
+    return project_info_json["project"]["id"]
+
+def publish_workbook_for_metadata(packaged_workbook_file_path: str, workbook_name: str, conn: TableauServerConnection = None, project_id: str = None):
+    if conn is None:
+        conn = get_metadata_connection()
+    if project_id is None:
+        project_id = get_metadata_project_id(conn)
     conn.publish_workbook(workbook_file_path=packaged_workbook_file_path, workbook_name=workbook_name, project_id=project_id, connection_username="PLACEHOLDER", connection_password="PLACEHOLDER")
-    workbook_xml_doc = ET.parse(workbook_file_path)
-    workbook_worksheets = workbook_xml_doc.findall(".//worksheet")
-    viz_info_list = []
-    for worksheet in workbook_worksheets:
-        worksheet_name = worksheet.get("name")
+    return conn
+
+def fetch_sheet_lineage_for_workbooks(packaged_workbook_file_paths: list):
+    # Publishes every workbook over one sign-in, then fetches all of their lineage through a single batched,
+    # rate-limited Metadata API client, so the request rate doesn't grow with the number of extraction workers.
+    # Publishing runs one workbook at a time: a signed-in connection isn't safe to share between threads.
+    # Returns ({workbook file path: sheet lineage}, {workbook file path: error})
+    published = {}
+    errors = {}
+    if not packaged_workbook_file_paths:
+        return {}, errors
+    try:
+        conn = get_metadata_connection()
+        project_id = get_metadata_project_id(conn)
+    except Exception as error:
+        return {}, {file_path: f"Signing in to publish for the Metadata API failed: {error!r}" for file_path in packaged_workbook_file_paths}
+    for packaged_workbook_file_path in packaged_workbook_file_paths:
+        workbook_name = get_workbook_name(packaged_workbook_file_path)
+        try:
+            publish_workbook_for_metadata(packaged_workbook_file_path, workbook_name, conn, project_id)
+            published[packaged_workbook_file_path] = workbook_name
+        except Exception as error:
+            errors[packaged_workbook_file_path] = f"Publishing {workbook_name} for the Metadata API failed: {error!r}"
+    sheet_lineage = {}
+    if published:
+        try:
+            lineage = MetadataApiClient.from_connection(conn).fetch_sheet_lineage(list(published.values()))
+        except Exception as error:
+            errors.update((file_path, f"Metadata API lineage request failed: {error!r}") for file_path in published)
+        else:
+            sheet_lineage = {file_path: lineage.get(workbook_name, {}) for file_path, workbook_name in published.items()}
+    return sheet_lineage, errors
+
+def extract_viz_info(workbook_file_path: str, packaged_workbook_file_path: str = None, offline: bool = False, sheet_lineage: dict = None):
+    return list(iter_viz_info(workbook_file_path, packaged_workbook_file_path, offline, sheet_lineage))
+
+def iter_viz_info(workbook_file_path: str, packaged_workbook_file_path: str = None, offline: bool = False, sheet_lineage: dict = None):
+    # A .twbx on its own is enough: it is published as-is and its embedded .twb is streamed from the archive
+    if packaged_workbook_file_path is None:
+        packaged_workbook_file_path = workbook_file_path
+    workbook_name = get_workbook_name(packaged_workbook_file_path)
+    with open_workbook(workbook_file_path) as workbook_file:
+        workbook_xml_doc = ET.parse(workbook_file)
+    # Offline lineage resolves tables/columns from the workbook XML itself; the Tableau Online
+    # Metadata API path is kept for cross-checking. Bulk runs pass in sheet_lineage fetched up front
+    # (see fetch_sheet_lineage_for_workbooks) instead of publishing and querying per workbook
+    datasource_lineage = None
+    if offline:
+        datasource_lineage = tableau_lineage_extractor.build_datasource_lineage(workbook_xml_doc)
+    elif sheet_lineage is None:
+        conn = publish_workbook_for_metadata(packaged_workbook_file_path, workbook_name)
+        # Every sheet's upstream tables/columns come back from one batched, rate-limited Metadata API request
+        sheet_lineage = MetadataApiClient.from_connection(conn).fetch_sheet_lineage([workbook_name])[workbook_name]
+    worksheet_index = build_worksheet_index(workbook_xml_doc)
+    for worksheet in worksheet_index.values():
+        worksheet_name = worksheet.name
         viz_title = get_viz_title(worksheet)
         viz_type = get_viz_type(worksheet)
         tables_used = None
@@ -119,11 +194,17 @@ def extract_viz_info(workbook_file_path: str, packaged_workbook_file_path: str):
         if (viz_type == "No Visualization"):
             tables_used = "No Tables Used"
             columns_used = "No Columns Used"
+        elif offline:
+            (tables_used, columns_used) = tableau_lineage_extractor.get_tables_and_columns(worksheet.datasource_dependencies, datasource_lineage)
         else:
-            (tables_used, columns_used) = get_tables_and_columns(workbook_name=workbook_name, worksheet_name=worksheet_name, connection=conn)
-        viz_info = VisualizationInfo(worksheet_name, viz_title, viz_type, tables_used, columns_used)
-        viz_info_list.append(viz_info)
+            (tables_used, columns_used) = sheet_lineage.get(worksheet_name, ("", ""))
+        yield VisualizationInfo(worksheet_name, viz_title, viz_type, tables_used, columns_used)
 
 def save_viz_info_to_json_and_excel(viz_info: str, json_file_path: str, excel_file_path: str):
     save_to_json(viz_info, json_file_path)
-    save_to_excel(viz_info, excel_file_path)
\ No newline at end of file
+    save_to_excel(viz_info, excel_file_path)
+
+def save_viz_info(visualization_info_list: list, base_file_path: str, formats: tuple = DEFAULT_EXPORT_FORMATS):
+    savers = {"json": save_to_json, "xlsx": save_to_excel, "csv": save_to_csv, "jsonl": save_to_jsonl}
+    for export_format in formats:
+        savers[export_format](visualization_info_list, get_export_file_path(base_file_path, export_format))
\ No newline at end of file
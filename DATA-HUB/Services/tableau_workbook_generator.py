@@ -0,0 +1,142 @@
+import io
+import os
+import random
+import zipfile
+from xml.sax.saxutils import quoteattr
+
+MARK_CLASSES = ["Automatic", "Bar", "Line", "Area", "Square", "Circle", "Shape", "Text", "Pie", "Map"]
+
+class WorkbookShape:
+    def __init__(self, datasources: int = 1, named_connections: int = 1, tables: int = 5, columns: int = 20,
+                 calculated_fields: int = 5, worksheets: int = 10, columns_per_worksheet: int = 4, dashboards: int = 2,
+                 sheets_per_dashboard: int = 4, seed: int = 0):
+        self.datasources = datasources
+        self.named_connections = named_connections
+        self.tables = tables
+        self.columns = columns
+        self.calculated_fields = calculated_fields
+        self.worksheets = worksheets
+        self.columns_per_worksheet = columns_per_worksheet
+        self.dashboards = dashboards
+        self.sheets_per_dashboard = sheets_per_dashboard
+        self.seed = seed
+
+# Rough size targets for the benchmark harness; "xlarge" produces a workbook well over 100 MB
+PRESETS = {
+    "small": WorkbookShape(),
+    "medium": WorkbookShape(datasources=5, named_connections=2, tables=20, columns=40, calculated_fields=20, worksheets=100, dashboards=10),
+    "large": WorkbookShape(datasources=20, named_connections=3, tables=50, columns=60, calculated_fields=50, worksheets=1000, dashboards=50),
+    "xlarge": WorkbookShape(datasources=50, named_connections=4, tables=100, columns=100, calculated_fields=100, worksheets=5000,
+                            columns_per_worksheet=8, dashboards=200, sheets_per_dashboard=10),
+}
+
+def get_datasource_name(datasource_index: int):
+    return f"federated.ds{datasource_index:05d}"
+
+def get_connection_name(datasource_index: int, connection_index: int):
+    return f"sqlserver.ds{datasource_index:05d}c{connection_index:03d}"
+
+def get_table_name(table_index: int):
+    return f"Table{table_index:04d}"
+
+def get_column_name(table_index: int, column_index: int):
+    return f"T{table_index:04d}Column{column_index:04d}"
+
+def write_datasource(out, shape: WorkbookShape, datasource_index: int, rng: random.Random):
+    datasource_name = get_datasource_name(datasource_index)
+    out.write(f"    <datasource caption={quoteattr(f'Datasource {datasource_index}')} inline='true' name='{datasource_name}' version='18.1'>\n")
+    out.write("      <connection class='federated'>\n        <named-connections>\n")
+    for connection_index in range(shape.named_connections):
+        server = f"SERVER{datasource_index:03d}-{connection_index:02d}\\SQLEXPRESS"
+        out.write(f"          <named-connection caption={quoteattr(server)} name='{get_connection_name(datasource_index, connection_index)}'>\n")
+        out.write(f"            <connection authentication='sqlserver' class='sqlserver' dbname='Database{datasource_index:03d}_{connection_index:02d}' "
+                  f"server={quoteattr(server)} sslmode='{'require' if connection_index % 2 else 'disable'}' username='api-access' />\n")
+        out.write("          </named-connection>\n")
+    out.write("        </named-connections>\n        <relation type='collection'>\n")
+    for table_index in range(shape.tables):
+        connection_name = get_connection_name(datasource_index, table_index % shape.named_connections)
+        table_name = get_table_name(table_index)
+        out.write(f"          <relation connection='{connection_name}' name='{table_name}' table='[dbo].[{table_name}]' type='table' />\n")
+    out.write("        </relation>\n        <cols>\n")
+    for table_index in range(shape.tables):
+        for column_index in range(shape.columns):
+            column_name = get_column_name(table_index, column_index)
+            out.write(f"          <map key='[{column_name}]' value='[{get_table_name(table_index)}].[{column_name}]' />\n")
+    out.write("        </cols>\n        <metadata-records>\n")
+    for table_index in range(shape.tables):
+        for column_index in range(shape.columns):
+            column_name = get_column_name(table_index, column_index)
+            out.write("          <metadata-record class='column'>\n"
+                      f"            <remote-name>{column_name}</remote-name>\n"
+                      f"            <local-name>[{column_name}]</local-name>\n"
+                      f"            <parent-name>[{get_table_name(table_index)}]</parent-name>\n"
+                      "            <local-type>integer</local-type>\n"
+                      "          </metadata-record>\n")
+    out.write("        </metadata-records>\n      </connection>\n")
+    for calculation_index in range(shape.calculated_fields):
+        first = get_column_name(rng.randrange(shape.tables), rng.randrange(shape.columns))
+        second = get_column_name(rng.randrange(shape.tables), rng.randrange(shape.columns))
+        formula = quoteattr(f"SUM([{first}]) / SUM([{second}])")
+        out.write(f"      <column caption='Calculation {calculation_index}' datatype='real' name='[Calculation_{calculation_index:05d}]' role='measure' type='quantitative'>\n"
+                  f"        <calculation class='tableau' formula={formula} />\n"
+                  "      </column>\n")
+    out.write("    </datasource>\n")
+
+def write_worksheet(out, shape: WorkbookShape, worksheet_index: int, rng: random.Random):
+    datasource_index = worksheet_index % shape.datasources
+    datasource_name = get_datasource_name(datasource_index)
+    out.write(f"    <worksheet name='Sheet {worksheet_index}'>\n")
+    out.write("      <layout-options>\n        <title>\n          <formatted-text>\n"
+              f"            <run>Visualization {worksheet_index}</run>\n"
+              "          </formatted-text>\n        </title>\n      </layout-options>\n")
+    out.write("      <table>\n        <view>\n          <datasources>\n"
+              f"            <datasource caption={quoteattr(f'Datasource {datasource_index}')} name='{datasource_name}' />\n"
+              "          </datasources>\n"
+              f"          <datasource-dependencies datasource='{datasource_name}'>\n")
+    for _ in range(shape.columns_per_worksheet):
+        column_name = get_column_name(rng.randrange(shape.tables), rng.randrange(shape.columns))
+        out.write(f"            <column datatype='integer' name='[{column_name}]' role='measure' type='quantitative' />\n"
+                  f"            <column-instance column='[{column_name}]' derivation='Sum' name='[sum:{column_name}:qk]' pivot='key' type='quantitative' />\n")
+    if shape.calculated_fields:
+        out.write(f"            <column datatype='real' name='[Calculation_{rng.randrange(shape.calculated_fields):05d}]' role='measure' type='quantitative' />\n")
+    out.write("          </datasource-dependencies>\n        </view>\n        <panes>\n          <pane>\n"
+              f"            <mark class='{MARK_CLASSES[worksheet_index % len(MARK_CLASSES)]}' />\n"
+              "          </pane>\n        </panes>\n"
+              f"        <rows>[{datasource_name}].[sum:{get_column_name(0, 0)}:qk]</rows>\n"
+              "        <cols />\n      </table>\n    </worksheet>\n")
+
+def write_dashboard(out, shape: WorkbookShape, dashboard_index: int, rng: random.Random):
+    out.write(f"    <dashboard name='Dashboard {dashboard_index}'>\n      <zones>\n")
+    for zone_index in range(shape.sheets_per_dashboard):
+        out.write(f"        <zone h='50000' id='{zone_index + 1}' name='Sheet {rng.randrange(shape.worksheets)}' w='50000' x='0' y='0' />\n")
+    out.write("      </zones>\n    </dashboard>\n")
+
+def write_workbook_xml(out, shape: WorkbookShape):
+    # Written element by element so arbitrarily large workbooks never sit in memory
+    rng = random.Random(shape.seed)
+    out.write("<?xml version='1.0' encoding='utf-8' ?>\n")
+    out.write("<workbook original-version='18.1' source-build='synthetic' version='18.1'>\n  <datasources>\n")
+    for datasource_index in range(shape.datasources):
+        write_datasource(out, shape, datasource_index, rng)
+    out.write("  </datasources>\n  <worksheets>\n")
+    for worksheet_index in range(shape.worksheets):
+        write_worksheet(out, shape, worksheet_index, rng)
+    out.write("  </worksheets>\n  <dashboards>\n")
+    for dashboard_index in range(shape.dashboards):
+        write_dashboard(out, shape, dashboard_index, rng)
+    out.write("  </dashboards>\n</workbook>\n")
+
+def generate_workbook(file_path: str, shape: WorkbookShape):
+    # .twb is written as-is; .twbx gets the workbook plus a placeholder extract, like Tableau's own packages
+    os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+    if not file_path.lower().endswith(".twbx"):
+        with open(file_path, "w", encoding="utf-8") as out:
+            write_workbook_xml(out, shape)
+        return file_path
+    workbook_member = os.path.splitext(os.path.basename(file_path))[0] + ".twb"
+    with zipfile.ZipFile(file_path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        with archive.open(workbook_member, "w", force_zip64=True) as member:
+            with io.TextIOWrapper(member, encoding="utf-8") as out:
+                write_workbook_xml(out, shape)
+        archive.writestr("Data/Extracts/synthetic.hyper", os.urandom(64 * 1024))
+    return file_path
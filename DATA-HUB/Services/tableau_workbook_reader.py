@@ -0,0 +1,29 @@
+import os
+import zipfile
+from contextlib import contextmanager
+
+WORKBOOK_EXTENSION = ".twb"
+PACKAGED_WORKBOOK_EXTENSION = ".twbx"
+
+def is_packaged_workbook(file_path: str):
+    _, extension = os.path.splitext(file_path)
+    return extension.lower() == PACKAGED_WORKBOOK_EXTENSION
+
+def get_workbook_member_name(archive: zipfile.ZipFile):
+    members = [info.filename for info in archive.infolist() if info.filename.lower().endswith(WORKBOOK_EXTENSION)]
+    if not members:
+        raise ValueError("No .twb workbook found in the packaged Tableau file.")
+    # Tableau writes the workbook at the archive root; prefer it over anything nested under Data/
+    return min(members, key=lambda name: name.count("/"))
+
+@contextmanager
+def open_workbook(file_path: str):
+    # Yields a binary stream of the workbook XML. For a .twbx only the embedded .twb member
+    # is decompressed on the fly; nothing is extracted to disk and the bundled data files are never read.
+    if not is_packaged_workbook(file_path):
+        with open(file_path, "rb") as workbook_file:
+            yield workbook_file
+        return
+    with zipfile.ZipFile(file_path) as archive:
+        with archive.open(get_workbook_member_name(archive)) as workbook_file:
+            yield workbook_file
@@ -0,0 +1,146 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from Services import tableau_connection_info_extractor
+from Services import tableau_visualizationInfo_extractor
+from Services.tableau_extraction_cache import EXTRACTOR_VERSION
+from Services.tableau_workbook_generator import PRESETS, WorkbookShape, generate_workbook
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the DATA-HUB extractors and exporters on synthetic workbooks.")
+    parser.add_argument("--presets", default="small,medium",
+                        help=f"Comma separated workbook size presets ({', '.join(PRESETS)})")
+    parser.add_argument("--custom", action="append", default=[], metavar="FIELD=VALUE,...",
+                        help="Extra workbook shape, e.g. datasources=10,worksheets=500 (repeatable)")
+    parser.add_argument("--workbook-formats", default="twb,twbx", help="Comma separated workbook formats to generate (twb, twbx)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per benchmark")
+    parser.add_argument("--output", default="benchmark results.json", help="Machine-readable results file")
+    parser.add_argument("--compare", help="Previous results file to compare against")
+    parser.add_argument("--workbook-dir", help="Keep the generated workbooks in this directory instead of a temp dir")
+    return parser.parse_args()
+
+def parse_shape(spec: str):
+    fields = {}
+    for assignment in spec.split(","):
+        name, _, value = assignment.partition("=")
+        fields[name.strip()] = int(value)
+    return WorkbookShape(**fields)
+
+def get_git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def get_benchmarks(workbook_file_path: str, output_dir: str):
+    data_source_info = tableau_connection_info_extractor.extract_data_source_info(workbook_file_path, streaming=True)
+    visualization_info = tableau_visualizationInfo_extractor.extract_viz_info(workbook_file_path, offline=True)
+    output_path = os.path.join(output_dir, "output")
+    return [
+        ("extract_data_source_info", lambda: tableau_connection_info_extractor.extract_data_source_info(workbook_file_path)),
+        ("extract_data_source_info[streaming]", lambda: tableau_connection_info_extractor.extract_data_source_info(workbook_file_path, streaming=True)),
+        ("extract_viz_info[offline]", lambda: tableau_visualizationInfo_extractor.extract_viz_info(workbook_file_path, offline=True)),
+        ("connection save_to_json", lambda: tableau_connection_info_extractor.save_to_json(data_source_info, output_path + ".json")),
+        ("connection save_to_excel", lambda: tableau_connection_info_extractor.save_to_excel(data_source_info, output_path + ".xlsx")),
+        ("connection save_to_csv", lambda: tableau_connection_info_extractor.save_to_csv(data_source_info, output_path + ".csv")),
+        ("connection save_to_jsonl", lambda: tableau_connection_info_extractor.save_to_jsonl(data_source_info, output_path + ".jsonl")),
+        ("visualization save_to_json", lambda: tableau_visualizationInfo_extractor.save_to_json(visualization_info, output_path + ".json")),
+        ("visualization save_to_excel", lambda: tableau_visualizationInfo_extractor.save_to_excel(visualization_info, output_path + ".xlsx")),
+        ("visualization save_to_csv", lambda: tableau_visualizationInfo_extractor.save_to_csv(visualization_info, output_path + ".csv")),
+        ("visualization save_to_jsonl", lambda: tableau_visualizationInfo_extractor.save_to_jsonl(visualization_info, output_path + ".jsonl")),
+    ]
+
+def measure(benchmark, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        benchmark()
+        timings.append(time.perf_counter() - start)
+    # Memory is traced in a separate run so tracing overhead never skews the timings
+    tracemalloc.start()
+    benchmark()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return timings, peak_memory
+
+def run_benchmarks(shapes: dict, workbook_formats: list, repeat: int, workbook_dir: str):
+    results = []
+    for shape_name, shape in shapes.items():
+        for workbook_format in workbook_formats:
+            workbook_file_path = os.path.join(workbook_dir, f"{shape_name}.{workbook_format}")
+            start = time.perf_counter()
+            generate_workbook(workbook_file_path, shape)
+            print(f"Generated {workbook_file_path} ({os.path.getsize(workbook_file_path) / 1e6:.1f} MB) in {time.perf_counter() - start:.1f}s")
+            for benchmark_name, benchmark in get_benchmarks(workbook_file_path, workbook_dir):
+                timings, peak_memory = measure(benchmark, repeat)
+                result = {
+                    "shape": shape_name,
+                    "shape_fields": vars(shape),
+                    "workbook_format": workbook_format,
+                    "workbook_bytes": os.path.getsize(workbook_file_path),
+                    "benchmark": benchmark_name,
+                    "seconds_min": min(timings),
+                    "seconds_median": statistics.median(timings),
+                    "peak_traced_bytes": peak_memory,
+                }
+                results.append(result)
+                print(f"  {benchmark_name:<40} {result['seconds_median'] * 1000:>10.1f} ms  {peak_memory / 1e6:>10.1f} MB peak")
+    return results
+
+def get_result_key(result: dict):
+    return (result["shape"], result["workbook_format"], result["benchmark"])
+
+def compare_results(results: list, baseline_file_path: str):
+    with open(baseline_file_path, "r", encoding="utf-8") as baseline_file:
+        baseline = {get_result_key(result): result for result in json.load(baseline_file)["results"]}
+    print(f"\nComparison against {baseline_file_path} (ratio > 1 is slower / bigger):")
+    for result in results:
+        previous = baseline.get(get_result_key(result))
+        if previous is None:
+            continue
+        time_ratio = result["seconds_median"] / previous["seconds_median"] if previous["seconds_median"] else float("inf")
+        memory_ratio = result["peak_traced_bytes"] / previous["peak_traced_bytes"] if previous["peak_traced_bytes"] else float("inf")
+        print(f"  {result['shape']:<8} {result['workbook_format']:<5} {result['benchmark']:<40} time x{time_ratio:.2f}  memory x{memory_ratio:.2f}")
+
+def main():
+    args = parse_args()
+    shapes = {name: PRESETS[name] for name in args.presets.split(",") if name}
+    for index, spec in enumerate(args.custom):
+        shapes[f"custom{index}"] = parse_shape(spec)
+    workbook_formats = [workbook_format.strip() for workbook_format in args.workbook_formats.split(",") if workbook_format.strip()]
+    workbook_dir = args.workbook_dir or tempfile.mkdtemp(prefix="tableau-benchmark-")
+    try:
+        results = run_benchmarks(shapes, workbook_formats, args.repeat, workbook_dir)
+    finally:
+        if not args.workbook_dir:
+            shutil.rmtree(workbook_dir, ignore_errors=True)
+    report = {
+        "metadata": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_revision": get_git_revision(),
+            "extractor_version": EXTRACTOR_VERSION,
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as output_file:
+        json.dump(report, output_file, indent=4)
+    print(f"Wrote {len(results)} result(s) to {args.output}")
+    if args.compare:
+        compare_results(results, args.compare)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,49 @@
+import argparse
+import os
+import time
+from Services.tableau_metadata_catalog import MetadataCatalog
+
+def parse_args():
+    base_path = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Impact analysis over the Tableau metadata catalog built by program.py --catalog.")
+    parser.add_argument("--db", default=os.path.join(base_path, "Tableau Analysis", "metadata catalog.db"),
+                        help="Path of the SQLite metadata catalog")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    column_parser = subparsers.add_parser("column", help="Workbooks and worksheets that use a column")
+    column_parser.add_argument("column_name")
+    column_parser.add_argument("--table", help="Only match the column in this table")
+    table_parser = subparsers.add_parser("table", help="Workbooks and worksheets that use a table")
+    table_parser.add_argument("table_name")
+    datasource_parser = subparsers.add_parser("datasource", help="Workbooks connected to a datasource (type, or connection string prefix)")
+    datasource_parser.add_argument("connection_string")
+    subparsers.add_parser("workbooks", help="List the catalogued workbooks")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    if not os.path.exists(args.db):
+        print(f"No catalog found at {args.db}")
+        return 1
+    with MetadataCatalog(args.db) as catalog:
+        start = time.perf_counter()
+        if args.command == "column":
+            headers = ["Workbook", "Path", "Worksheet", "Table", "Column"]
+            rows = catalog.find_column_usage(args.column_name, args.table)
+        elif args.command == "table":
+            headers = ["Workbook", "Path", "Worksheet"]
+            rows = catalog.find_table_usage(args.table_name)
+        elif args.command == "datasource":
+            headers = ["Workbook", "Path", "Connection Type", "Connection Info"]
+            rows = catalog.find_datasource_usage(args.connection_string)
+        else:
+            headers = ["Workbook", "Path", "Content Hash", "Lineage Source", "Loaded At"]
+            rows = catalog.list_workbooks()
+        elapsed = time.perf_counter() - start
+    print("\t".join(headers))
+    for row in rows:
+        print("\t".join("" if value is None else str(value) for value in row))
+    print(f"{len(rows)} row(s) in {elapsed * 1000:.1f} ms")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,27 +1,82 @@
-﻿import traceback
-from Services import tableau_connection_info_extractor
-from Services import tableau_visualizationInfo_extractor
-from pathlib import Path
+﻿import argparse
+import os
+from Services import tableau_bulk_extractor
+from Services.tableau_extraction_cache import ExtractionCache, get_lineage_source, get_workbook_hash
+from Services.tableau_metadata_catalog import MetadataCatalog
+from Services.tableau_visualizationInfo_extractor import get_workbook_name
+from Services.tableau_exporters import EXPORT_FORMATS, DEFAULT_EXPORT_FORMATS
+
+def parse_args():
+    base_path = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Extract connection and visualization metadata from Tableau workbooks.")
+    parser.add_argument("source", nargs="?", default=os.path.join(base_path, "Workbooks"),
+                        help="Directory or glob pattern of .twb/.twbx workbooks")
+    parser.add_argument("-o", "--output", default=os.path.join(base_path, "Tableau Analysis"),
+                        help="Directory the per-workbook JSON/Excel results are written to")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(),
+                        help="Number of worker processes (without --offline, workbooks are first published to Tableau Online one at a time)")
+    parser.add_argument("--skip-viz", action="store_true",
+                        help="Only extract connection info (no Tableau Online visualization lookup)")
+    parser.add_argument("--offline", action="store_true",
+                        help="Resolve worksheet tables/columns from the workbook XML instead of the Tableau Online Metadata API")
+    parser.add_argument("--formats", default=",".join(DEFAULT_EXPORT_FORMATS),
+                        help=f"Comma separated output formats ({', '.join(EXPORT_FORMATS)})")
+    parser.add_argument("--catalog", nargs="?", const=os.path.join(base_path, "Tableau Analysis", "metadata catalog.db"),
+                        help="Also load the results into this SQLite metadata catalog (see catalog.py)")
+    parser.add_argument("--cache-dir", default=os.path.join(base_path, ".extraction-cache"),
+                        help="Directory of cached extraction results keyed by workbook content hash")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Re-parse every workbook without reading or writing the cache")
+    parser.add_argument("--clear-cache", action="store_true",
+                        help="Drop every cached result before running")
+    parser.add_argument("--invalidate", action="append", default=[], metavar="WORKBOOK",
+                        help="Drop the cached result of one workbook before running (repeatable)")
+    args = parser.parse_args()
+    args.formats = tuple(export_format.strip() for export_format in args.formats.split(",") if export_format.strip())
+    unknown_formats = [export_format for export_format in args.formats if export_format not in EXPORT_FORMATS]
+    if unknown_formats:
+        parser.error(f"Unknown output format(s): {', '.join(unknown_formats)}")
+    return args
+
+def load_catalog(catalog: MetadataCatalog, result: tableau_bulk_extractor.ExtractionResult, lineage_source: str = None):
+    # --no-cache runs don't hash the workbook, but the catalog needs the hash to tell what it holds
+    content_hash = result.entry.workbook_hash or get_workbook_hash(result.workbook_file_path)
+    # Workbooks already loaded with this content (and lineage source) are left as they are
+    if catalog.is_current(result.workbook_file_path, content_hash, lineage_source):
+        return False
+    catalog.upsert_workbook(result.workbook_file_path, get_workbook_name(result.workbook_file_path), result.entry.data_source_info,
+                            result.entry.visualization_info, content_hash, lineage_source)
+    return True
 
 def main():
-    # Define file paths
-    base_path = r"C:\Users\ArjunNarendra(Quadra\Project Work\Repos\Quadrant-QHub\DATA-HUB\Tableau Analysis"
-    connection_info_json_file_path = base_path + "\connection info.json"
-    connection_info_excel_file_path = base_path + "\connection info.xlsx"
-    visualization_info_json_file_path = base_path + "\visualization info.json"
-    visualization_info_excel_file_path = base_path + "\visualization info.xlsx"
-    workbook_file_path = r"C:\Users\ArjunNarendra(Quadra\Project Work\Repos\Quadrant-QHub\DATA-HUB\Workbooks\World Wide Importers Analysis.twb"
-    packaged_workbook_file_path = workbook_file_path + "x"
-    try:
-        # Step 1: Extract data source information 
-        data_source_info = tableau_connection_info_extractor.extract_data_source_info(workbook_file_path)
-        tableau_connection_info_extractor.save_connection_info_to_json_and_excel(data_source_info, connection_info_json_file_path, connection_info_excel_file_path)
-        # Step 2: Extract visualization metadata 
-        visualization_info = tableau_visualizationInfo_extractor.extract_viz_info(workbook_file_path, packaged_workbook_file_path)
-        # tableau_visualizationInfo_extractor.save_viz_info_to_json_and_excel(visualization_info, visualization_info_json_file_path, visualization_info_excel_file_path)
-    except Exception as ex:
-        print(f"Error: {ex}")
-        traceback.print_exc()
+    args = parse_args()
+    cache_dir = None if args.no_cache else args.cache_dir
+    if cache_dir:
+        cache = ExtractionCache(cache_dir)
+        if args.clear_cache:
+            cache.clear()
+        for workbook_file_path in args.invalidate:
+            cache.invalidate(workbook_file_path)
+    workbook_file_paths = tableau_bulk_extractor.find_workbooks(args.source)
+    if not workbook_file_paths:
+        print(f"No workbooks found in {args.source}")
+        return 1
+    failures = 0
+    catalog = MetadataCatalog(args.catalog) if args.catalog else None
+    results = tableau_bulk_extractor.run_bulk_extraction(workbook_file_paths, args.output, args.workers, not args.skip_viz, cache_dir, args.offline, args.formats)
+    for count, result in enumerate(results, start=1):
+        if result.succeeded:
+            status = "CACHED" if result.cached else "OK    "
+            print(f"[{count}/{len(workbook_file_paths)}] {status} {result.workbook_file_path} -> {result.output_dir}")
+            if catalog:
+                load_catalog(catalog, result, None if args.skip_viz else get_lineage_source(args.offline))
+        else:
+            failures = failures + 1
+            print(f"[{count}/{len(workbook_file_paths)}] ERROR {result.workbook_file_path}\n{result.error}")
+    if catalog:
+        catalog.close()
+    print(f"Processed {len(workbook_file_paths)} workbook(s), {failures} failed.")
+    return 1 if failures else 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    raise SystemExit(main())
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The Services package is imported the way program.py imports it, from the DATA-HUB root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,53 @@
+import json
+import os
+from Services import tableau_bulk_extractor
+from Services.tableau_workbook_generator import WorkbookShape, generate_workbook
+
+FORMATS = ("json",)
+
+def read_worksheet_names(output_dir: str):
+    with open(os.path.join(output_dir, "visualization info.json"), "r", encoding="utf-8") as json_file:
+        return [info["worksheet_name"] for info in json.load(json_file)]
+
+def process(workbook_file_path: str, tmp_path):
+    return tableau_bulk_extractor.process_workbook(workbook_file_path, str(tmp_path / "out"), cache_dir=str(tmp_path / "cache"),
+                                                   offline=True, formats=FORMATS)
+
+def test_cache_hit_leaves_current_outputs_alone(tmp_path):
+    workbook_file_path = generate_workbook(str(tmp_path / "Sales.twb"), WorkbookShape(worksheets=3))
+    first = process(workbook_file_path, tmp_path)
+    output_file_path = os.path.join(first.output_dir, "visualization info.json")
+    os.utime(output_file_path, (0, 0))
+    second = process(workbook_file_path, tmp_path)
+    assert first.succeeded and not first.cached
+    assert second.succeeded and second.cached
+    assert os.path.getmtime(output_file_path) == 0
+
+def test_cache_hit_rewrites_outputs_of_another_workbook_version(tmp_path):
+    workbook_file_path = str(tmp_path / "Sales.twb")
+    generate_workbook(workbook_file_path, WorkbookShape(worksheets=3))
+    process(workbook_file_path, tmp_path)
+    generate_workbook(workbook_file_path, WorkbookShape(worksheets=5))
+    process(workbook_file_path, tmp_path)
+    # Reverting to the first version is a cache hit, but the outputs on disk are still the second version's
+    generate_workbook(workbook_file_path, WorkbookShape(worksheets=3))
+    result = process(workbook_file_path, tmp_path)
+    assert result.cached
+    assert len(read_worksheet_names(result.output_dir)) == 3
+
+def test_cache_hit_writes_formats_missing_from_an_earlier_run(tmp_path):
+    workbook_file_path = generate_workbook(str(tmp_path / "Sales.twb"), WorkbookShape(worksheets=3))
+    process(workbook_file_path, tmp_path)
+    result = tableau_bulk_extractor.process_workbook(workbook_file_path, str(tmp_path / "out"), cache_dir=str(tmp_path / "cache"),
+                                                     offline=True, formats=("json", "csv"))
+    assert result.cached
+    assert os.path.exists(os.path.join(result.output_dir, "visualization info.csv"))
+
+def test_workbooks_with_the_same_name_are_not_written_to_the_same_output_dir(tmp_path):
+    first = generate_workbook(str(tmp_path / "a" / "Sales.twb"), WorkbookShape(worksheets=3))
+    second = generate_workbook(str(tmp_path / "b" / "Sales.twb"), WorkbookShape(worksheets=5))
+    results = {result.workbook_file_path: result for result in tableau_bulk_extractor.run_bulk_extraction(
+        [first, second], str(tmp_path / "out"), max_workers=1, offline=True, formats=FORMATS)}
+    assert results[first].succeeded
+    assert not results[second].succeeded and first in results[second].error
+    assert len(read_worksheet_names(results[first].output_dir)) == 3
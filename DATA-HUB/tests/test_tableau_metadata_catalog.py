@@ -0,0 +1,66 @@
+import sqlite3
+import program
+from Services.tableau_bulk_extractor import ExtractionResult
+from Services.tableau_connection_info_extractor import DatasourceInfo, ConnectionInfo
+from Services.tableau_extraction_cache import CacheEntry, get_workbook_hash
+from Services.tableau_metadata_catalog import MetadataCatalog
+from Services.tableau_visualizationInfo_extractor import VisualizationInfo
+from Services.tableau_workbook_generator import WorkbookShape, generate_workbook
+
+def make_data_source_info():
+    data_source_info = DatasourceInfo()
+    data_source_info.connections.append(ConnectionInfo("sqlserver", "server/db", [{"table": "Orders", "columns": "Sales, Region"}]))
+    return data_source_info
+
+def make_visualization_info(*worksheet_names: str):
+    return [VisualizationInfo(name, "Title", "Bar", "Orders", "Sales") for name in worksheet_names]
+
+def get_worksheet_names(catalog: MetadataCatalog):
+    return sorted(row[0] for row in catalog.connection.execute("SELECT name FROM worksheets"))
+
+def test_a_new_load_replaces_the_stored_hash(tmp_path):
+    with MetadataCatalog(str(tmp_path / "catalog.db")) as catalog:
+        catalog.upsert_workbook("Sales.twb", "Sales", make_data_source_info(), make_visualization_info("A"), "hash-1", "offline")
+        catalog.upsert_workbook("Sales.twb", "Sales", make_data_source_info(), make_visualization_info("B"), "hash-2", "offline")
+        assert catalog.is_current("Sales.twb", "hash-2", "offline")
+        assert not catalog.is_current("Sales.twb", "hash-1", "offline")
+        catalog.upsert_workbook("Sales.twb", "Sales", make_data_source_info(), make_visualization_info("B"), None, "offline")
+        assert not catalog.is_current("Sales.twb", "hash-2")
+
+def test_is_current_checks_the_lineage_source_of_the_worksheets(tmp_path):
+    with MetadataCatalog(str(tmp_path / "catalog.db")) as catalog:
+        catalog.upsert_workbook("Sales.twb", "Sales", make_data_source_info(), make_visualization_info("A"), "hash-1", "offline")
+        assert catalog.is_current("Sales.twb", "hash-1", "offline")
+        assert not catalog.is_current("Sales.twb", "hash-1", "server")
+        assert catalog.is_current("Sales.twb", "hash-1")
+
+def test_a_load_without_worksheets_keeps_only_worksheets_of_the_same_content(tmp_path):
+    with MetadataCatalog(str(tmp_path / "catalog.db")) as catalog:
+        catalog.upsert_workbook("Sales.twb", "Sales", make_data_source_info(), make_visualization_info("A"), "hash-1", "server")
+        catalog.upsert_workbook("Sales.twb", "Sales", make_data_source_info(), None, "hash-1")
+        assert get_worksheet_names(catalog) == ["A"]
+        assert catalog.is_current("Sales.twb", "hash-1", "server")
+        catalog.upsert_workbook("Sales.twb", "Sales", make_data_source_info(), None, "hash-2")
+        assert get_worksheet_names(catalog) == []
+        assert catalog.is_current("Sales.twb", "hash-2")
+        assert not catalog.is_current("Sales.twb", "hash-2", "server")
+
+def test_catalogs_without_a_lineage_source_column_are_migrated(tmp_path):
+    db_path = str(tmp_path / "catalog.db")
+    connection = sqlite3.connect(db_path)
+    connection.execute("CREATE TABLE workbooks (id INTEGER PRIMARY KEY, path TEXT NOT NULL UNIQUE, name TEXT NOT NULL, content_hash TEXT, loaded_at TEXT NOT NULL)")
+    connection.execute("INSERT INTO workbooks (path, name, content_hash, loaded_at) VALUES ('/Sales.twb', 'Sales', 'hash-1', 'then')")
+    connection.commit()
+    connection.close()
+    with MetadataCatalog(db_path) as catalog:
+        assert catalog.is_current("/Sales.twb", "hash-1")
+        assert not catalog.is_current("/Sales.twb", "hash-1", "offline")
+
+def test_no_cache_results_are_loaded_with_the_workbook_hash(tmp_path):
+    workbook_file_path = generate_workbook(str(tmp_path / "Sales.twb"), WorkbookShape(worksheets=2))
+    entry = CacheEntry(None, "offline", make_data_source_info(), make_visualization_info("A"))
+    result = ExtractionResult(workbook_file_path, str(tmp_path / "out"), entry=entry)
+    with MetadataCatalog(str(tmp_path / "catalog.db")) as catalog:
+        assert program.load_catalog(catalog, result, "offline")
+        assert catalog.is_current(workbook_file_path, get_workbook_hash(workbook_file_path), "offline")
+        assert not program.load_catalog(catalog, result, "offline")
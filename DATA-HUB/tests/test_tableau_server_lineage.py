@@ -0,0 +1,56 @@
+from Services import tableau_bulk_extractor
+from Services import tableau_visualizationInfo_extractor
+from Services.tableau_workbook_generator import WorkbookShape, generate_workbook
+
+class FakeResponse:
+    def __init__(self, json_data: dict):
+        self.json_data = json_data
+
+    def json(self):
+        return self.json_data
+
+class FakeConnection:
+    def __init__(self):
+        self.server = "https://example.com"
+        self.auth_token = "token"
+        self.ssl_verify = True
+        self.projects = []
+        self.published = []
+
+    def query_projects(self, parameter_dict=None):
+        return FakeResponse({"projects": {"project": [{"id": project_id} for project_id in self.projects]}})
+
+    def create_project(self, project_name, project_description=None):
+        if self.projects:
+            return FakeResponse({"error": {"summary": "Resource Conflict"}})
+        self.projects.append("project-1")
+        return FakeResponse({"project": {"id": "project-1"}})
+
+    def publish_workbook(self, workbook_file_path, workbook_name, project_id, **kwargs):
+        self.published.append((workbook_name, project_id))
+
+def test_every_workbook_is_published_into_the_one_metadata_project(monkeypatch):
+    conn = FakeConnection()
+    monkeypatch.setattr(tableau_visualizationInfo_extractor, "get_metadata_connection", lambda: conn)
+    monkeypatch.setattr(tableau_visualizationInfo_extractor.MetadataApiClient, "fetch_sheet_lineage",
+                        lambda client, workbook_names: {name: {"Sheet 1": ("T", "c")} for name in workbook_names})
+    sheet_lineage, errors = tableau_visualizationInfo_extractor.fetch_sheet_lineage_for_workbooks(["a/One.twbx", "b/Two.twbx", "c/Three.twbx"])
+    assert errors == {}
+    assert conn.published == [("One", "project-1"), ("Two", "project-1"), ("Three", "project-1")]
+    assert sheet_lineage["b/Two.twbx"] == {"Sheet 1": ("T", "c")}
+
+def test_corrupt_workbook_does_not_abort_a_server_mode_run(tmp_path, monkeypatch):
+    good = generate_workbook(str(tmp_path / "workbooks" / "Good.twb"), WorkbookShape(worksheets=2))
+    bad = str(tmp_path / "workbooks" / "Bad.twbx")
+    with open(bad, "wb") as bad_file:
+        bad_file.write(b"not a zip archive")
+    requested = []
+    def fetch_sheet_lineage_for_workbooks(workbook_file_paths):
+        requested.extend(workbook_file_paths)
+        return {workbook_file_path: {} for workbook_file_path in workbook_file_paths}, {}
+    monkeypatch.setattr(tableau_visualizationInfo_extractor, "fetch_sheet_lineage_for_workbooks", fetch_sheet_lineage_for_workbooks)
+    results = {result.workbook_file_path: result for result in tableau_bulk_extractor.run_bulk_extraction(
+        [bad, good], str(tmp_path / "out"), max_workers=1, cache_dir=str(tmp_path / "cache"), formats=("json",))}
+    assert requested == [good]
+    assert not results[bad].succeeded and "BadZipFile" in results[bad].error
+    assert results[good].succeeded